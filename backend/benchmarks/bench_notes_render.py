@@ -0,0 +1,72 @@
+"""Benchmark notes PDF rendering for large documents.
+
+Run from the backend directory:
+    python -m benchmarks.bench_notes_render --concepts 50 --documents 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from services.pdf_renderer import render_notes_pdf
+
+
+def build_notes(num_concepts: int) -> str:
+    """Build notes text in the same shape the notes prompt asks the model for."""
+    sections = []
+    for i in range(num_concepts):
+        minutes, seconds = divmod(i * 45, 60)
+        sections.append(
+            f"### Concept {i + 1}: Gradient descent variant {i}\n"
+            f"**Timestamp:** 00:{minutes:02d}:{seconds:02d}\n"
+            f"**Explanation:** This concept covers how the update rule changes the parameters "
+            f"at each step, why the learning rate matters, and how momentum smooths noisy "
+            f"gradients. It is revisited later in the video with a worked example {i}."
+        )
+    return "\n\n".join(sections)
+
+
+def bench_inline(content: str, documents: int) -> list:
+    durations = []
+    for _ in range(documents):
+        start = time.perf_counter()
+        render_notes_pdf(content)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+async def bench_pool(content: str, documents: int) -> float:
+    from services import notes
+
+    # Warm the pool so worker start-up is not counted
+    await notes.render_notes_pdf_async(content)
+    start = time.perf_counter()
+    await asyncio.gather(*(notes.render_notes_pdf_async(content) for _ in range(documents)))
+    elapsed = time.perf_counter() - start
+    notes.shutdown_render_executor()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concepts", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pool", action="store_true", help="also render concurrently through the render pool")
+    args = parser.parse_args()
+
+    content = build_notes(args.concepts)
+    durations = bench_inline(content, args.documents)
+    size = len(render_notes_pdf(content))
+    print(f"{args.concepts}-concept document: {size / 1024:.1f} KiB PDF")
+    print(
+        f"inline render: mean {statistics.mean(durations) * 1000:.1f} ms, "
+        f"max {max(durations) * 1000:.1f} ms over {args.documents} documents"
+    )
+
+    if args.pool:
+        elapsed = asyncio.run(bench_pool(content, args.documents))
+        print(f"pool render: {args.documents} documents in {elapsed * 1000:.1f} ms total")
+
+
+if __name__ == "__main__":
+    main()
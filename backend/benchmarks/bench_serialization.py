@@ -0,0 +1,111 @@
+"""Benchmark response serialization for message pages and conversation lists.
+
+Compares the validating path (Model(**doc), response_model re-validation,
+jsonable_encoder and stdlib json) with the trusted path (model_construct and
+pydantic-core JSON) that the listing endpoints use.
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization --messages 100 --conversations 500 --rounds 200
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models.conversation import ConversationResponse
+from models.message import MessageResponse
+from services.serialization import dump_json, from_documents
+
+
+def build_messages(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    conversation_id = str(ObjectId())
+    user_id = str(ObjectId())
+    return [
+        {
+            "_id": ObjectId(),
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "content": f"Message {i}: why does the learning rate change the convergence in this example? " * 3,
+            "message_type": "user" if i % 2 else "assistant",
+            "timestamp": now - timedelta(seconds=i),
+            "metadata": {"timestamp": "00:12:34", "source": "query"} if i % 2 == 0 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def build_conversations(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    user_id = str(ObjectId())
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "video_url": f"https://www.youtube.com/watch?v=video{i:05d}",
+            "title": f"Lecture {i}",
+            "notes_url": None,
+            "concepts": [f"Concept {j}" for j in range(15)],
+            "created_at": now - timedelta(hours=i),
+            "updated_at": now - timedelta(hours=i),
+        }
+        for i in range(count)
+    ]
+
+
+def validating_path(model, docs: List[dict]) -> bytes:
+    """What the endpoints did before: validate, re-validate for response_model, encode twice"""
+    items = []
+    for doc in docs:
+        doc = dict(doc, _id=str(doc["_id"]))
+        items.append(model(**doc))
+    adapter = TypeAdapter(List[model])
+    validated = adapter.validate_python([item.model_dump(by_alias=True) for item in items])
+    return json.dumps(jsonable_encoder(validated, by_alias=True)).encode("utf-8")
+
+
+def trusted_path(model, docs: List[dict]) -> bytes:
+    return dump_json(from_documents(model, [dict(doc) for doc in docs]))
+
+
+def bench(fn, model, docs: List[dict], rounds: int) -> float:
+    fn(model, docs)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(model, docs)
+    return (time.perf_counter() - start) / rounds
+
+
+def report(label: str, model, docs: List[dict], rounds: int):
+    before = bench(validating_path, model, docs, rounds)
+    after = bench(trusted_path, model, docs, rounds)
+    assert json.loads(validating_path(model, docs)) == json.loads(trusted_path(model, docs))
+    print(
+        f"{label}: validating {before * 1000:.2f} ms, trusted {after * 1000:.2f} ms "
+        f"({before / after:.1f}x faster)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--conversations", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    report(f"{args.messages}-message page", MessageResponse, build_messages(args.messages), args.rounds)
+    report(
+        f"{args.conversations}-conversation list",
+        ConversationResponse,
+        build_conversations(args.conversations),
+        args.rounds,
+    )
+
+
+if __name__ == "__main__":
+    main()
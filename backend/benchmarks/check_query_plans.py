@@ -0,0 +1,222 @@
+"""Query-plan regression check for the Mongo queries issued by the services.
+
+Runs explain() for every query shape against a local mongod after ensuring the
+indexes the services register, and exits non-zero on any COLLSCAN or in-memory SORT.
+
+Run from the backend directory (the database is dropped afterwards):
+    MONGODB_CONNECTION_STRING=mongodb://localhost:27017 python -m benchmarks.check_query_plans
+
+The same checks run under pytest (tests/test_query_plans.py) when MONGO_URI is set.
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from services.database import mongodb_service
+from services.pagination import encode_cursor, keyset_filter
+
+# Imported for their index registrations
+from services import conversation_service, message_service, user_service, memory_store  # noqa: F401
+
+
+CHECK_DATABASE = "query_plan_check"
+USER_ID = str(ObjectId())
+CONVERSATION_ID = ObjectId()
+
+# (description, collection, filter, sort, limit, projection) mirroring the services' queries.
+# Updates and find_one_and_update pick their plan from the filter, so they are explained as
+# the equivalent find with limit 1
+QUERIES = [
+    ("user_service.get_user_by_email", "users", {"email": "a@example.com"}, None, 1, None),
+    ("user_service.get_user", "users", {"_id": ObjectId()}, None, 1, None),
+    ("feedback_agent._create_user_runner", "users", {"_id": ObjectId(USER_ID)}, None, 1, None),
+    ("feedback_agent._create_user_runner update", "users", {"_id": ObjectId(USER_ID)}, None, 1, None),
+    ("conversation_service.get_conversation", "conversations", {"_id": CONVERSATION_ID}, None, 1, None),
+    (
+        "conversation_service.update_conversation",
+        "conversations",
+        {"_id": CONVERSATION_ID},
+        None,
+        1,
+        None,
+    ),
+    (
+        "conversation_service.find_by_video_url",
+        "conversations",
+        {"user_id": USER_ID, "video_url": "https://youtu.be/x"},
+        None,
+        1,
+        None,
+    ),
+    (
+        "conversation_service.get_user_conversations",
+        "conversations",
+        {"user_id": USER_ID},
+        [("created_at", DESCENDING)],
+        0,
+        None,
+    ),
+    (
+        "conversation_service.get_user_conversation_summaries",
+        "conversations",
+        {
+            "user_id": USER_ID,
+            **keyset_filter("created_at", encode_cursor(datetime.utcnow(), ObjectId()), descending=True),
+        },
+        [("created_at", DESCENDING), ("_id", DESCENDING)],
+        51,
+        conversation_service.SUMMARY_PROJECTION,
+    ),
+    (
+        "message_service.get_conversation_messages",
+        "messages",
+        {"conversation_id": str(CONVERSATION_ID)},
+        [("timestamp", ASCENDING)],
+        50,
+        None,
+    ),
+    (
+        "message_service.get_user_messages",
+        "messages",
+        {"user_id": USER_ID},
+        [("timestamp", DESCENDING)],
+        50,
+        None,
+    ),
+    (
+        "message_service.get_conversation_messages_page",
+        "messages",
+        {
+            "conversation_id": str(CONVERSATION_ID),
+            **keyset_filter("timestamp", encode_cursor(datetime.utcnow(), ObjectId()), descending=True),
+        },
+        [("timestamp", DESCENDING), ("_id", DESCENDING)],
+        51,
+        None,
+    ),
+    (
+        "message_service.get_user_messages_page",
+        "messages",
+        {
+            "user_id": USER_ID,
+            **keyset_filter("timestamp", encode_cursor(datetime.utcnow(), ObjectId()), descending=True),
+        },
+        [("timestamp", DESCENDING), ("_id", DESCENDING)],
+        51,
+        None,
+    ),
+    (
+        "memory_store.get",
+        "user_memories",
+        {"user_id": USER_ID},
+        None,
+        1,
+        {"summary": 1, "memories": 1, "version": 1},
+    ),
+    ("memory_store.get_version", "user_memories", {"user_id": USER_ID}, None, 1, {"version": 1}),
+    ("memory_store._write", "user_memories", {"user_id": USER_ID, "version": 3}, None, 1, None),
+    (
+        "memory_store._write first version",
+        "user_memories",
+        {"user_id": USER_ID, "$or": [{"version": 0}, {"version": {"$exists": False}}]},
+        None,
+        1,
+        None,
+    ),
+]
+
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+async def seed(db):
+    now = datetime.utcnow()
+    await db.users.insert_many([{"email": f"user{i}@example.com"} for i in range(50)])
+    await db.conversations.insert_many(
+        [
+            {"user_id": str(ObjectId()), "video_url": f"https://youtu.be/{i}", "created_at": now}
+            for i in range(50)
+        ]
+    )
+    await db.messages.insert_many(
+        [
+            {
+                "conversation_id": str(ObjectId()),
+                "user_id": str(ObjectId()),
+                "timestamp": now - timedelta(seconds=i),
+            }
+            for i in range(200)
+        ]
+    )
+    await db.user_memories.insert_many([{"user_id": str(ObjectId()), "memories": []} for _ in range(50)])
+
+
+def plan_stages(plan: dict):
+    """Yield every stage name in a winning plan tree"""
+    yield plan.get("stage")
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            yield from plan_stages(child)
+
+
+async def explain(db, collection, query_filter, sort, limit, projection) -> dict:
+    command = {"find": collection, "filter": query_filter}
+    if sort:
+        command["sort"] = dict(sort)
+    if limit:
+        command["limit"] = limit
+    if projection:
+        command["projection"] = projection
+    result = await db.command({"explain": command, "verbosity": "queryPlanner"})
+    winning_plan = result["queryPlanner"]["winningPlan"]
+    # Slot-based execution engine wraps the classic plan
+    return winning_plan.get("queryPlan", winning_plan)
+
+
+async def prepare(connection_string: Optional[str] = None):
+    """Connect to a scratch database, seed it and create the registered indexes"""
+    if connection_string:
+        mongodb_service.connection_string = connection_string
+    await mongodb_service.connect()
+    mongodb_service.db = mongodb_service.client[CHECK_DATABASE]
+    await mongodb_service.client.drop_database(CHECK_DATABASE)
+    await seed(mongodb_service.db)
+    await mongodb_service.create_indexes()
+    return mongodb_service.db
+
+
+async def cleanup():
+    await mongodb_service.client.drop_database(CHECK_DATABASE)
+    await mongodb_service.disconnect()
+
+
+async def plan_stage_names(db, query: tuple) -> List[str]:
+    """Winning plan stages for one QUERIES entry (without its description)"""
+    plan = await explain(db, *query)
+    return [stage for stage in plan_stages(plan) if stage]
+
+
+async def main() -> int:
+    failures = []
+    db = await prepare()
+    try:
+        for description, *query in QUERIES:
+            stages = await plan_stage_names(db, tuple(query))
+            bad = BAD_STAGES.intersection(stages)
+            print(f"{'FAIL' if bad else 'ok':>4}  {description}: {' <- '.join(stages)}")
+            if bad:
+                failures.append(description)
+    finally:
+        await cleanup()
+
+    if failures:
+        print(f"{len(failures)} queries use a collection scan or in-memory sort")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,80 @@
+"""Offline evaluation of the local feedback pre-classifier.
+
+Run from the backend directory:
+    python -m benchmarks.eval_feedback_classifier [--data benchmarks/data/feedback_labels.jsonl] [--verbose]
+
+Each line of the data file is {"text": ..., "worth_remembering": bool}. Reports precision
+and recall of the local decisions and the share of LLM calls they avoid. Exits non-zero if
+a preference is skipped or anything is stored without the LLM.
+"""
+import argparse
+import json
+import os
+import sys
+
+from services.feedback_agent import FeedbackPreClassifier
+
+
+DEFAULT_DATA = os.path.join(os.path.dirname(__file__), "data", "feedback_labels.jsonl")
+
+
+def load_examples(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def ratio(numerator: int, denominator: int) -> float:
+    return numerator / denominator if denominator else 0.0
+
+
+def evaluate(classifier: FeedbackPreClassifier, examples: list, verbose: bool = False) -> dict:
+    counts = {"tp": 0, "fp": 0, "tn": 0, "fn": 0, "escalated": 0}
+    for example in examples:
+        label = example["worth_remembering"]
+        decision = classifier.classify(example["text"])
+        if decision is None:
+            counts["escalated"] += 1
+            outcome = "escalated"
+        elif decision.worth_remembering:
+            outcome = "tp" if label else "fp"
+            counts[outcome] += 1
+        else:
+            outcome = "tn" if not label else "fn"
+            counts[outcome] += 1
+        if verbose:
+            print(f"{outcome:>9}  {classifier.score(example['text']):5.1f}  {example['text']}")
+
+    positives = sum(1 for e in examples if e["worth_remembering"])
+    negatives = len(examples) - positives
+    decided = len(examples) - counts["escalated"]
+    return {
+        **counts,
+        "positive_precision": ratio(counts["tp"], counts["tp"] + counts["fp"]),
+        "positive_recall": ratio(counts["tp"], positives),
+        "negative_precision": ratio(counts["tn"], counts["tn"] + counts["fn"]),
+        "negative_recall": ratio(counts["tn"], negatives),
+        "call_reduction": ratio(decided, len(examples)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument("--verbose", action="store_true", help="print the decision for every example")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    report = evaluate(FeedbackPreClassifier(), examples, args.verbose)
+
+    print(f"examples: {len(examples)}")
+    print(f"decided locally: tp={report['tp']} fp={report['fp']} tn={report['tn']} fn={report['fn']}, escalated={report['escalated']}")
+    print(f"positive precision: {report['positive_precision']:.2%}  recall: {report['positive_recall']:.2%}")
+    print(f"negative precision: {report['negative_precision']:.2%}  recall: {report['negative_recall']:.2%}")
+    print(f"LLM call reduction: {report['call_reduction']:.2%}")
+    # Local decisions bypass the LLM, so a wrong one is never corrected
+    if report["fn"] or report["tp"] or report["fp"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
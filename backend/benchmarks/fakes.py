@@ -0,0 +1,348 @@
+"""Fake drop-ins for the external services, with configurable latency distributions.
+
+Used by the offline load test. Latencies are lognormal around a median, so tails look
+like real network calls. Sync fakes sleep with time.sleep, exactly like the blocking
+SDK calls they replace, so any of them running on the event loop shows up as loop lag.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+
+class LatencyModel:
+    """Lognormal latency with the given median (ms) and spread (sigma of the log)"""
+
+    def __init__(self, median_ms: float, sigma: float = 0.5):
+        self.median_ms = median_ms
+        self.sigma = sigma
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """Parse "MEDIAN_MS" or "MEDIAN_MS:SIGMA"."""
+        median, _, sigma = spec.partition(":")
+        return cls(float(median), float(sigma) if sigma else 0.5)
+
+    def sample(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * math.exp(random.gauss(0, self.sigma)) / 1000
+
+    def sleep(self):
+        time.sleep(self.sample())
+
+    async def asleep(self):
+        await asyncio.sleep(self.sample())
+
+
+# --- GenerativeModel ---
+
+def _usage(prompt: str, output: str):
+    return SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(output) // 4)
+
+
+def _fake_output(prompt: str) -> str:
+    """Schema-shaped output for the prompts the services send, recognised by their instructions"""
+    if '"questions" array' in prompt:
+        return json.dumps(
+            {
+                "questions": [
+                    {
+                        "question": f"Which statement about concept {i} is correct?",
+                        "options": ["Option A", "Option B", "Option C", "Option D"],
+                        "correct_option": "Option A",
+                        "timestamp": f"00:0{i}:00",
+                    }
+                    for i in range(8)
+                ]
+            }
+        )
+    if '"notes" array' in prompt:
+        concepts = re.findall(r'"([^"]+)"', prompt.rsplit("exactly as given:", 1)[-1].split("\n", 1)[0])
+        return json.dumps(
+            {
+                "notes": [
+                    {
+                        "concept": concept,
+                        "timestamp": "00:01:30",
+                        "explanation": f"{concept} is explained with a worked example in the video. " * 2,
+                    }
+                    for concept in concepts
+                ]
+            }
+        )
+    if '"concepts" array' in prompt:
+        return json.dumps({"concepts": [f"Concept {random.randint(0, 30)}" for _ in range(5)]})
+    if '"answer" string' in prompt:
+        return json.dumps({"answer": "The video explains this at the given timestamp. " * 3, "timestamp": "00:02:15"})
+    return "## Revision\n\n" + "- Review this concept with a short example.\n" * 10
+
+
+class FakeGenerativeModel:
+    def __init__(self, latency: LatencyModel, model_name: str = "gemini-2.5-flash", chunk_size: int = 200):
+        self._model_name = model_name
+        self.latency = latency
+        self.chunk_size = chunk_size
+
+    def generate_content(self, contents, generation_config=None, stream: bool = False, **kwargs):
+        prompt = contents if isinstance(contents, str) else str(contents)
+        output = _fake_output(prompt)
+        if stream:
+            return self._stream(prompt, output)
+        self.latency.sleep()
+        return SimpleNamespace(text=output, usage_metadata=_usage(prompt, output))
+
+    def _stream(self, prompt: str, output: str):
+        chunks = [output[i : i + self.chunk_size] for i in range(0, len(output), self.chunk_size)]
+        # Time to first chunk dominates; the rest arrive quickly
+        self.latency.sleep()
+        for i, text in enumerate(chunks):
+            if i:
+                time.sleep(self.latency.sample() / 20)
+            usage = _usage(prompt, output) if i == len(chunks) - 1 else None
+            yield SimpleNamespace(text=text, usage_metadata=usage)
+
+
+# --- vertexai.preview.rag ---
+
+class FakeRag:
+    """Stand-in for the vertexai.preview.rag module."""
+
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+        self._corpora: Dict[str, SimpleNamespace] = {}
+
+    def RagResource(self, rag_corpus: str):
+        return SimpleNamespace(rag_corpus=rag_corpus)
+
+    def list_corpora(self):
+        self.latency.sleep()
+        return list(self._corpora.values())
+
+    def create_corpus(self, display_name: str):
+        self.latency.sleep()
+        corpus = SimpleNamespace(
+            name=f"projects/bench/locations/us-west1/ragCorpora/{len(self._corpora)}",
+            display_name=display_name,
+            create_time=datetime.utcnow(),
+        )
+        self._corpora[display_name] = corpus
+        return corpus
+
+    def list_files(self, corpus_name: str):
+        self.latency.sleep()
+        return []
+
+    def delete_file(self, name: str):
+        self.latency.sleep()
+
+    def upload_file(self, corpus_name: str, path: str, display_name: str = "", description: str = ""):
+        self.latency.sleep()
+        return SimpleNamespace(name=f"{corpus_name}/ragFiles/{display_name}")
+
+    def retrieval_query(self, rag_resources, text: str, similarity_top_k: int = 5, **kwargs):
+        self.latency.sleep()
+        contexts = [
+            SimpleNamespace(
+                text=f"[00:0{i}:00] Transcript passage {i} discussing {text[:40]}.",
+                source_uri="bench",
+                distance=0.1 * i,
+            )
+            for i in range(similarity_top_k)
+        ]
+        return SimpleNamespace(contexts=SimpleNamespace(contexts=contexts))
+
+
+# --- YoutubeLoader ---
+
+def fake_transcript(chunks: int = 60) -> list:
+    return [
+        SimpleNamespace(
+            page_content=f"In this part of the lecture we discuss topic {i} and work through an example. " * 4,
+            metadata={"start_timestamp": i * 30},
+        )
+        for i in range(chunks)
+    ]
+
+
+class FakeYoutubeLoader:
+    latency = LatencyModel(0)
+    chunks = 60
+
+    @classmethod
+    def from_youtube_url(cls, url: str, **kwargs) -> "FakeYoutubeLoader":
+        return cls()
+
+    def load(self) -> list:
+        self.latency.sleep()
+        return fake_transcript(self.chunks)
+
+
+# --- Motor ---
+
+def _compare(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict) or not any(k.startswith("$") for k in condition):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$exists":
+            if (value is not None) != bool(operand):
+                return False
+        elif op == "$lt" and not (value is not None and value < operand):
+            return False
+        elif op == "$lte" and not (value is not None and value <= operand):
+            return False
+        elif op == "$gt" and not (value is not None and value > operand):
+            return False
+        elif op == "$gte" and not (value is not None and value >= operand):
+            return False
+    return True
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _compare(doc.get(key), condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return dict(doc)
+    return {k: v for k, v in doc.items() if k == "_id" or projection.get(k)}
+
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", docs: List[dict]):
+        self._collection = collection
+        self._docs = docs
+
+    def sort(self, key, direction=None):
+        keys = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda d: d.get(field), reverse=order < 0)
+        return self
+
+    def skip(self, count: int):
+        self._docs = self._docs[count:]
+        return self
+
+    def limit(self, count: int):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        await self._collection.latency.asleep()
+        return [dict(d) for d in self._docs[:length]]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in await self.to_list():
+            yield doc
+
+
+class FakeCollection:
+    """Just enough of AsyncIOMotorCollection for the services, with per-operation latency."""
+
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+        self._docs: Dict[Any, dict] = {}
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None):
+        await self.latency.asleep()
+        for doc in self._docs.values():
+            if matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    def find(self, query: dict, projection: Optional[dict] = None):
+        return FakeCursor(self, [_project(d, projection) for d in self._docs.values() if matches(d, query)])
+
+    async def insert_one(self, doc: dict):
+        await self.latency.asleep()
+        doc.setdefault("_id", ObjectId())
+        self._docs[doc["_id"]] = dict(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs: List[dict]):
+        ids = [(await self.insert_one(doc)).inserted_id for doc in docs]
+        return SimpleNamespace(inserted_ids=ids)
+
+    def _apply(self, doc: dict, update: dict):
+        doc.update(update.get("$set", {}))
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await self.latency.asleep()
+        for doc in self._docs.values():
+            if matches(doc, query):
+                self._apply(doc, update)
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith("$")}
+            doc.setdefault("_id", ObjectId())
+            self._apply(doc, update)
+            self._docs[doc["_id"]] = doc
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def find_one_and_update(self, query: dict, update: dict, return_document=False, **kwargs):
+        await self.latency.asleep()
+        for doc in self._docs.values():
+            if matches(doc, query):
+                before = dict(doc)
+                self._apply(doc, update)
+                return dict(doc) if return_document else before
+        return None
+
+    async def create_indexes(self, indexes):
+        return [index.document["name"] for index in indexes]
+
+
+class FakeDatabase:
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self.latency)
+        return self._collections[name]
+
+
+def install(
+    llm_latency: LatencyModel,
+    rag_latency: LatencyModel,
+    youtube_latency: LatencyModel,
+    mongo_latency: Optional[LatencyModel],
+):
+    """Swap the fakes into the already imported service modules.
+
+    With mongo_latency None the database is left alone so a real mongod can be used.
+    """
+    from services import rag, vertex
+    from services.database import mongodb_service
+    from services.feedback_agent import feedback_agent
+
+    model = FakeGenerativeModel(llm_latency)
+    rag._model = model
+    rag._rag_api = FakeRag(rag_latency)
+    vertex.init_vertexai = lambda location=vertex.LOCATION: None
+    rag.PROJECT_ID = rag.PROJECT_ID or "bench"
+    FakeYoutubeLoader.latency = youtube_latency
+    rag.get_youtube_loader = lambda: (FakeYoutubeLoader, "chunks")
+    feedback_agent._classifier_model = model
+
+    if mongo_latency is not None:
+        mongodb_service.db = FakeDatabase(mongo_latency)
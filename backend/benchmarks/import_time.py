@@ -0,0 +1,103 @@
+"""Check the API's cold-start import time and that heavy providers load lazily.
+
+Imports main in a fresh interpreter with -X importtime and fails (exit 1) when the
+import takes longer than the budget or eagerly imports a module that should only
+load on first use (Vertex AI, ADK, LangChain, FPDF).
+
+Run from the backend directory:
+    python -m benchmarks.import_time --budget-ms 1500 --runs 3
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+LAZY_MODULES = (
+    "vertexai",
+    "google.adk",
+    "google.genai",
+    "langchain_community",
+    "langchain_text_splitters",
+    "fpdf",
+)
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """Import the module in a fresh interpreter; returns (name, cumulative_us, depth) rows"""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(2)), len(match.group(3)) // 2))
+    return rows
+
+
+def import_ms(rows: List[Tuple[str, int, int]], module: str) -> float:
+    """Cumulative import time of the module itself, leaving out interpreter start-up"""
+    return next(c for name, c, depth in rows if name == module and depth == 0) / 1000
+
+
+def eager_lazy_modules(rows: List[Tuple[str, int, int]]) -> List[str]:
+    """The LAZY_MODULES that were imported anyway"""
+    names = {name for name, _, _ in rows}
+    return [
+        lazy for lazy in LAZY_MODULES
+        if any(name == lazy or name.startswith(lazy + ".") for name in names)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="report the median of this many fresh imports")
+    parser.add_argument("--top", type=int, default=15, help="slowest direct imports to list")
+    args = parser.parse_args()
+
+    totals = []
+    rows = []
+    for _ in range(args.runs):
+        rows = measure(args.module)
+        totals.append(import_ms(rows, args.module))
+    total_ms = statistics.median(totals)
+
+    # Direct imports of the module, cumulative over everything they pull in. Rows are
+    # listed children first, so they are the depth 1 rows just before the module's own
+    slowest: Dict[str, int] = {}
+    end = next(i for i, (name, _, depth) in enumerate(rows) if name == args.module and depth == 0)
+    for name, cumulative, depth in reversed(rows[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            slowest[name] = cumulative
+    print(f"import {args.module}: median {total_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    for name, cumulative in sorted(slowest.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = eager_lazy_modules(rows)
+    if eager:
+        print(f"FAIL: imported eagerly, should load on first use: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Offline load test of the API with fake Gemini, Vertex RAG, YouTube and Mongo.
+
+Drives the endpoints in-process through httpx's ASGI transport at a fixed concurrency
+and reports latency percentiles, throughput and event loop lag per scenario.
+
+Run from the backend directory:
+    python -m benchmarks.load_test --scenarios query,video,quiz,notes --concurrency 16 --requests 200
+    python -m benchmarks.load_test --llm-latency 900:0.6 --rag-latency 150 --mongo-latency 2
+
+Latencies are "MEDIAN_MS[:SIGMA]" of a lognormal distribution. Pass --mongo-uri to
+run against a local mongod instead of the in-memory Motor fake (the database is dropped).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from benchmarks.fakes import LatencyModel, fake_transcript, install
+
+
+BENCH_DATABASE = "load_test"
+LOOP_LAG_INTERVAL = 0.01
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Samples how late a short sleep wakes up; the overshoot is time the loop was blocked"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def seed(users: int) -> List[dict]:
+    """Create a user, a conversation with concepts and a loaded transcript per virtual client"""
+    from models.conversation import ConversationCreate
+    from models.user import User
+    from services import rag
+    from services.conversation_service import conversation_service
+
+    clients = []
+    for i in range(users):
+        # Valid ObjectId hex, like real user ids
+        user = User(_id=f"{i:024x}", email=f"bench{i}@example.com", full_name=f"Bench {i}")
+        conversation = await conversation_service.create_conversation(
+            ConversationCreate(user_id=user.id, video_url=f"https://www.youtube.com/watch?v=bench{i:04d}")
+        )
+        await conversation_service.update_conversation(
+            conversation.id, concepts=[f"Concept {c}" for c in range(12)]
+        )
+        rag.user_docs.set(user.id, fake_transcript())
+        rag.user_video_urls.set(user.id, conversation.video_url)
+        clients.append({"user": user, "conversation_id": conversation.id, "video_url": conversation.video_url})
+    return clients
+
+
+def scenario_requests(client: dict) -> Dict[str, Callable]:
+    headers = {"x-bench-user": client["user"].id}
+
+    async def query(http):
+        response = await http.post(
+            "/api/query",
+            json={"query": "How does gradient descent converge?", "conversation_id": client["conversation_id"]},
+            headers=headers,
+        )
+        response.raise_for_status()
+
+    async def video(http):
+        async with http.stream("POST", "/api/video", json={"url": client["video_url"]}, headers=headers) as response:
+            response.raise_for_status()
+            last = ""
+            async for line in response.aiter_lines():
+                if line:
+                    last = line
+        if '"completed"' not in last:
+            raise RuntimeError(f"video stream did not complete: {last[:200]}")
+
+    async def quiz(http):
+        response = await http.post("/api/create_quiz", headers=headers)
+        response.raise_for_status()
+
+    async def notes(http):
+        response = await http.get(
+            "/api/important_notes", params={"conversation_id": client["conversation_id"]}, headers=headers
+        )
+        response.raise_for_status()
+
+    return {"query": query, "video": video, "quiz": quiz, "notes": notes}
+
+
+async def run_scenario(http, name: str, clients: List[dict], total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors: List[str] = []
+    remaining = iter(range(total))
+    monitor = LoopLagMonitor()
+
+    async def worker(client: dict):
+        request = scenario_requests(client)[name]
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                await request(http)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(str(e))
+
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(clients[i % len(clients)]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    return {
+        "scenario": name,
+        "ok": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": latencies,
+        "loop_lag": monitor.samples,
+    }
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.1f}"
+
+
+def print_report(result: dict):
+    latency, lag = result["latency"], result["loop_lag"]
+    print(
+        f"{result['scenario']:<6} ok={result['ok']:<5} errors={len(result['errors']):<4} "
+        f"{result['throughput']:7.1f} req/s | latency ms p50{ms(percentile(latency, 50))} "
+        f"p95{ms(percentile(latency, 95))} p99{ms(percentile(latency, 99))} | "
+        f"loop lag ms p50{ms(percentile(lag, 50))} p99{ms(percentile(lag, 99))} "
+        f"max{ms(max(lag, default=0.0))}"
+    )
+    if result["errors"]:
+        print(f"       first error: {result['errors'][0][:300]}")
+
+
+async def main_async(args) -> int:
+    import httpx
+    from fastapi import Request
+
+    import main
+    from services import security_service
+    from services.database import mongodb_service
+
+    install(
+        llm_latency=LatencyModel.parse(args.llm_latency),
+        rag_latency=LatencyModel.parse(args.rag_latency),
+        youtube_latency=LatencyModel.parse(args.youtube_latency),
+        mongo_latency=None if args.mongo_uri else LatencyModel.parse(args.mongo_latency),
+    )
+    if args.mongo_uri:
+        mongodb_service.connection_string = args.mongo_uri
+        await mongodb_service.connect()
+        mongodb_service.db = mongodb_service.client[BENCH_DATABASE]
+        await mongodb_service.client.drop_database(BENCH_DATABASE)
+        await mongodb_service.create_indexes()
+
+    if not args.notes_cache:
+        main.notes_pdf_cache.get = lambda key: None
+
+    users = {}
+
+    async def bench_user(request: Request):
+        return users[request.headers["x-bench-user"]]
+
+    main.app.dependency_overrides[security_service.get_current_user] = bench_user
+
+    clients = await seed(args.concurrency)
+    users.update({client["user"].id: client["user"] for client in clients})
+
+    print(
+        f"{datetime.utcnow():%Y-%m-%d %H:%M:%S} concurrency={args.concurrency} requests={args.requests} "
+        f"llm={args.llm_latency} rag={args.rag_latency} youtube={args.youtube_latency} "
+        f"mongo={args.mongo_uri or args.mongo_latency}"
+    )
+    failed = False
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            for name in args.scenarios.split(","):
+                result = await run_scenario(http, name.strip(), clients, args.requests, args.concurrency)
+                print_report(result)
+                failed = failed or bool(result["errors"])
+    finally:
+        main.shutdown_render_executor()
+        if args.mongo_uri:
+            await mongodb_service.client.drop_database(BENCH_DATABASE)
+            await mongodb_service.disconnect()
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default="query,video,quiz,notes")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--llm-latency", default="800:0.5")
+    parser.add_argument("--rag-latency", default="120:0.4")
+    parser.add_argument("--youtube-latency", default="400:0.5")
+    parser.add_argument("--mongo-latency", default="1:0.3")
+    parser.add_argument("--mongo-uri", help="use a local mongod instead of the Motor fake")
+    parser.add_argument("--notes-cache", action="store_true", help="serve repeated notes from the PDF cache")
+    args = parser.parse_args()
+
+    # Keep the benchmark's on-disk state out of the working tree
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    os.environ.setdefault("NOTES_CACHE_DIR", os.path.join(workdir, "notes_pdf_cache"))
+    os.environ.setdefault("FEEDBACK_QUEUE_PATH", os.path.join(workdir, "feedback_queue.db"))
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
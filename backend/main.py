@@ -1,5 +1,5 @@
-from fastapi import FastAPI, HTTPException, Depends
-from typing import List
+from fastapi import FastAPI, HTTPException, Depends, Header
+from typing import List, Optional
 from pydantic import BaseModel
 from fastapi.responses import StreamingResponse, Response
 from services.rag import (
@@ -8,22 +8,52 @@ from services.rag import (
     clear_vector_store,
     debug_corpus_state,
     debug_retrieve_content,
+    warm_up_providers,
+    WARM_UP_PROVIDERS,
+)
+from services.quiz import (
+    generate_quiz,
+    generate_remedial_quiz,
+    build_quiz_prompt,
+    stream_questions,
+)
+from services.notes import (
+    generate_important_notes_pdf,
+    iter_note_sections,
+    render_note_sections_pdf,
+    sections_complete,
+    shutdown_render_executor,
+    NotesGenerationError,
+    NO_CONCEPTS_MESSAGE,
+)
+from services.notes_cache import (
+    notes_pdf_cache,
+    notes_cache_key,
+    etag_matches,
+    cache_control_header,
 )
-from services.quiz import generate_quiz, generate_remedial_quiz
-from services.notes import generate_important_notes_pdf
 from services.feedback_agent import feedback_agent
+from services.feedback_queue import feedback_processor
+from services.memory_store import user_memory_store
 from services.database import mongodb_service
 from services.user_service import user_service, UserService
 from services.conversation_service import conversation_service
 from services.message_service import message_service
 from services import security_service
+from services.metrics import metrics_registry, metrics_authorized, METRICS_TOKEN
+from services.serialization import FastJSONResponse
+from services.llm_accounting import LLMAccountingMiddleware, LLM_USAGE_HEADER, generate_content
+from services.profiling import ProfilingMiddleware, PROFILING_TOKEN
+from services.loop_monitor import loop_monitor
 from models.user import User, Token
-from models.conversation import ConversationCreate, ConversationResponse
-from models.message import MessageCreate, MessageResponse
+from models.conversation import ConversationCreate, ConversationResponse, ConversationPage
+from models.message import MessageCreate, MessageResponse, MessagePage
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Query, APIRouter
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import os
 # --- App Initialization ---
 origins = [
@@ -39,10 +69,24 @@ async def lifespan_context(app: FastAPI):
     # Startup
     await mongodb_service.connect()
     print("Connected to MongoDB")
+    await mongodb_service.create_indexes()
+    await feedback_processor.start()
+    if WARM_UP_PROVIDERS:
+        try:
+            await asyncio.to_thread(warm_up_providers)
+            print("Warmed up model providers")
+        except Exception as e:
+            print(f"Warning: provider warm-up failed, they will load on first use: {e}")
+    # Started last so lag samples reflect request traffic, not startup work
+    loop_monitor.start()
     yield
     # Shutdown
+    await feedback_processor.stop()
+    await security_service.google_token_verifier.aclose()
+    shutdown_render_executor()
     await mongodb_service.disconnect()
     print("Disconnected from MongoDB")
+    await loop_monitor.stop()
 
 
 app = FastAPI(title="YouTube RAG API", version="1.0.0", lifespan=lifespan_context)
@@ -53,7 +97,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LLM_USAGE_HEADER],
 )
+app.add_middleware(LLMAccountingMiddleware)
+if PROFILING_TOKEN:
+    # Only installed when configured, so unprofiled deployments pay nothing
+    app.add_middleware(ProfilingMiddleware, token=PROFILING_TOKEN)
 
 # --- Routers ---
 auth_router = APIRouter()
@@ -100,7 +149,14 @@ class FeedbackRequest(BaseModel):
 class FeedbackResponse(BaseModel):
     status: str
     message: str
+    job_id: Optional[str] = None
+
+
+class FeedbackStatusResponse(BaseModel):
+    job_id: str
+    status: str
     stored: bool
+    message: Optional[str] = None
 
 
 # --- Authentication Endpoints ---
@@ -143,8 +199,6 @@ async def load_video(
         clear_vector_store(user_id)  # Clear any previous in-memory state for this user
 
         async def video_processing_stream(conversation_id, is_new):
-            import json
-
             status = "new_conversation" if is_new else "existing_conversation"
             message = (
                 "Created new conversation, processing video"
@@ -236,12 +290,19 @@ async def query(
         )
 
 
+async def get_notes_cache_key(conversation: ConversationResponse, user_id: str) -> str:
+    """Cache key / ETag of the rendered notes for a conversation."""
+    memory_version = await user_memory_store.get_version(user_id)
+    return notes_cache_key(conversation.id, conversation.concepts, memory_version)
+
+
 @api_router.get("/important_notes")
 async def get_important_notes(
     conversation_id: str,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(security_service.get_current_user),
 ):
-    """Generate and return important notes PDF for a conversation."""
+    """Generate and return important notes PDF for a conversation, served from cache when unchanged."""
     try:
         conversation = await conversation_service.get_conversation(conversation_id)
         if not conversation:
@@ -250,26 +311,108 @@ async def get_important_notes(
         if str(conversation.user_id) != str(current_user.id):
              raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
 
-        pdf_content = await generate_important_notes_pdf(
-            user_id=str(current_user.id), concepts=conversation.concepts
-        )
+        user_id = str(current_user.id)
+        cache_key = await get_notes_cache_key(conversation, user_id)
+        etag = f'"{cache_key}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control_header()}
 
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        pdf_content = await asyncio.to_thread(notes_pdf_cache.get, cache_key)
+        if pdf_content is None:
+            timings = {}
+            # Raises on failure, so only successfully rendered notes are cached
+            pdf_content, complete = await generate_important_notes_pdf(
+                user_id=user_id, concepts=conversation.concepts, timings=timings
+            )
+            if complete:
+                await asyncio.to_thread(notes_pdf_cache.put, cache_key, pdf_content)
+            else:
+                # Some concepts failed; serve what we have but let the next request retry
+                headers.pop("ETag")
+                headers["Cache-Control"] = "no-store"
+            headers["Server-Timing"] = ", ".join(
+                f"notes-{stage};dur={duration:.1f}" for stage, duration in timings.items()
+            )
+        else:
+            headers["Server-Timing"] = 'notes-cache;desc="hit"'
+
+        headers["Content-Disposition"] = f"attachment; filename=notes_{conversation_id}.pdf"
         return Response(
             content=pdf_content,
             media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=notes_{conversation_id}.pdf"},
+            headers=headers,
         )
+    except HTTPException:
+        raise
+    except NotesGenerationError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate notes: {str(e)}")
 
 
+@api_router.get("/important_notes/stream")
+async def stream_important_notes(
+    conversation_id: str,
+    current_user: User = Depends(security_service.get_current_user),
+):
+    """Stream each concept section as NDJSON as soon as it is generated, then cache the assembled PDF."""
+    conversation = await conversation_service.get_conversation(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if str(conversation.user_id) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
+
+    user_id = str(current_user.id)
+    concepts = conversation.concepts
+
+    async def notes_stream():
+        if not concepts:
+            yield json.dumps({"type": "error", "message": NO_CONCEPTS_MESSAGE}) + "\n"
+            return
+
+        sections = [None] * len(concepts)
+        try:
+            async for index, section in iter_note_sections(user_id, concepts):
+                sections[index] = section
+                yield json.dumps({"type": "section", "index": index, **section}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "message": f"Failed to generate notes: {str(e)}"}) + "\n"
+            return
+
+        # A failed group leaves placeholder sections; caching them would pin the failure
+        complete = sections_complete(sections)
+        try:
+            if complete:
+                cache_key = await get_notes_cache_key(conversation, user_id)
+                pdf_content = await render_note_sections_pdf(sections)
+                await asyncio.to_thread(notes_pdf_cache.put, cache_key, pdf_content)
+        except Exception as e:
+            yield json.dumps({"type": "error", "message": f"Failed to assemble notes PDF: {str(e)}"}) + "\n"
+            return
+
+        completed = {
+            "type": "completed",
+            "count": len(sections),
+            "complete": complete,
+            "pdf_url": f"/api/important_notes?conversation_id={conversation_id}",
+        }
+        if complete:
+            completed["etag"] = f'"{cache_key}"'
+        yield json.dumps(completed) + "\n"
+
+    return StreamingResponse(notes_stream(), media_type="application/x-ndjson")
+
+
 @api_router.post("/create_quiz", response_model=QuizResponse)
 async def create_quiz_endpoint(
     current_user: User = Depends(security_service.get_current_user),
 ):
     """Generate a quiz for the user based on their current video context."""
     try:
-        questions = generate_quiz(str(current_user.id))
+        # Blocking: may reload an evicted transcript and waits for the model
+        questions = await asyncio.to_thread(generate_quiz, str(current_user.id))
         return QuizResponse(questions=questions)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -277,6 +420,35 @@ async def create_quiz_endpoint(
         raise HTTPException(status_code=500, detail=f"Failed to create quiz: {str(e)}")
 
 
+@api_router.post("/create_quiz/stream")
+async def create_quiz_stream_endpoint(
+    current_user: User = Depends(security_service.get_current_user),
+):
+    """Stream quiz questions as NDJSON as soon as each one is generated."""
+    try:
+        # May reload an evicted transcript from YouTube, so keep it off the event loop
+        prompt = await asyncio.to_thread(build_quiz_prompt, str(current_user.id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # A sync generator so Starlette iterates the blocking model stream in a threadpool
+    def quiz_stream():
+        count = 0
+        try:
+            for question in stream_questions(prompt, "quiz"):
+                yield json.dumps({"type": "question", "index": count, "question": question}) + "\n"
+                count += 1
+        except Exception as e:
+            yield json.dumps({"type": "error", "message": f"Failed to create quiz: {str(e)}", "count": count}) + "\n"
+            return
+        if count == 0:
+            yield json.dumps({"type": "error", "message": "Model output is not a list of questions", "count": 0}) + "\n"
+            return
+        yield json.dumps({"type": "completed", "count": count}) + "\n"
+
+    return StreamingResponse(quiz_stream(), media_type="application/x-ndjson")
+
+
 @api_router.post("/revision_doc", response_model=RevisionResponse)
 async def create_revision_doc(
     request: RevisionRequest,
@@ -287,12 +459,12 @@ async def create_revision_doc(
         # In a real app, this might use generate_remedial_quiz and some logic to create markdown
         # For now, we'll use a placeholder or call a service if available.
         # Based on imports, we have feedback_agent which might be relevant, or we can use LLM.
-        from services.rag import model
+        from services.rag import get_model
         
         mistakes_text = "\n".join([f"- {m.question} (Correct answer: {m.correct_option})" for m in request.mistakes])
         prompt = f"Based on the following mistakes in a video quiz, generate a helpful revision summary in markdown:\n\n{mistakes_text}"
         
-        response = model.generate_content(prompt)
+        response = await asyncio.to_thread(generate_content, get_model(), prompt, "revision_doc")
         return RevisionResponse(markdown_content=response.text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate revision doc: {str(e)}")
@@ -306,29 +478,46 @@ async def learn_from_mistakes(
     """Generate a remedial quiz based on user mistakes."""
     try:
         mistakes_dicts = [m.dict() for m in request.mistakes]
-        questions = generate_remedial_quiz(mistakes_dicts, str(current_user.id))
+        questions = await asyncio.to_thread(generate_remedial_quiz, mistakes_dicts, str(current_user.id))
         return QuizResponse(questions=questions)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate remedial quiz: {str(e)}")
 
 
-@api_router.post("/feedback", response_model=FeedbackResponse)
+@api_router.post("/feedback", response_model=FeedbackResponse, status_code=202)
 async def submit_feedback(
     request: FeedbackRequest,
     current_user: User = Depends(security_service.get_current_user),
 ):
-    """Submit feedback for the AI agent."""
+    """Accept feedback for the AI agent; classification and storage happen in the background."""
     try:
-        stored, message = await feedback_agent.process_feedback(str(current_user.id), request.feedback_text)
+        job_id = await feedback_processor.submit(str(current_user.id), request.feedback_text)
         return FeedbackResponse(
-            status="success",
-            message=message,
-            stored=stored
+            status="accepted",
+            message="Feedback received and queued for processing.",
+            job_id=job_id,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to submit feedback: {str(e)}")
 
 
+@api_router.get("/feedback/{job_id}", response_model=FeedbackStatusResponse)
+async def get_feedback_status(
+    job_id: str,
+    current_user: User = Depends(security_service.get_current_user),
+):
+    """Get the processing status of a feedback submission."""
+    job = await asyncio.to_thread(feedback_processor.queue.get, job_id)
+    if not job or job["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Feedback job not found")
+    return FeedbackStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        stored=bool(job["stored"]),
+        message=job["message"],
+    )
+
+
 @api_router.get("/conversations/{user_id}", response_model=List[ConversationResponse])
 async def get_user_conversations(
     user_id: str,
@@ -337,7 +526,38 @@ async def get_user_conversations(
     """Get all conversations for a user."""
     if str(user_id) != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized")
-    return await conversation_service.get_user_conversations(user_id)
+    return FastJSONResponse(await conversation_service.get_user_conversations(user_id))
+
+
+@api_router.get("/conversations/{user_id}/summaries", response_model=ConversationPage)
+async def get_user_conversation_summaries(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    current_user: User = Depends(security_service.get_current_user),
+):
+    """Get a page of conversation summaries for a user; pass next_cursor back for older ones."""
+    if str(user_id) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        page = await conversation_service.get_user_conversation_summaries(user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(page)
+
+
+@api_router.get("/conversation/{conversation_id}", response_model=ConversationResponse)
+async def get_conversation(
+    conversation_id: str,
+    current_user: User = Depends(security_service.get_current_user),
+):
+    """Get the full details of a conversation."""
+    conversation = await conversation_service.get_conversation(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if str(conversation.user_id) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return FastJSONResponse(conversation)
 
 
 @api_router.get("/messages/{conversation_id}", response_model=List[MessageResponse])
@@ -353,7 +573,27 @@ async def get_conversation_messages(
         raise HTTPException(status_code=404, detail="Conversation not found")
     if str(conversation.user_id) != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized")
-    return await message_service.get_conversation_messages(conversation_id, page, limit)
+    return FastJSONResponse(await message_service.get_conversation_messages(conversation_id, page, limit))
+
+
+@api_router.get("/messages/{conversation_id}/history", response_model=MessagePage)
+async def get_conversation_message_history(
+    conversation_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    current_user: User = Depends(security_service.get_current_user),
+):
+    """Get a page of messages, newest page first; pass next_cursor back to load older messages."""
+    conversation = await conversation_service.get_conversation(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if str(conversation.user_id) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        page = await message_service.get_conversation_messages_page(conversation_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(page)
 
 
 @api_router.post("/conversations", response_model=ConversationResponse)
@@ -375,6 +615,21 @@ async def root():
     return {"message": "YouTube RAG API", "version": "1.0.0"}
 
 
+@app.get("/metrics")
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Expose in-process metrics in the Prometheus text format to scrapers holding METRICS_TOKEN."""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not metrics_authorized(authorization):
+        raise HTTPException(
+            status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"}
+        )
+    return Response(
+        content=metrics_registry.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 # Include routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(api_router, prefix="/api", tags=["Application"])
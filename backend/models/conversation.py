@@ -20,3 +20,19 @@ class ConversationResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     title: Optional[str] = None
+
+
+class ConversationSummary(BaseModel):
+    model_config = ConfigDict(serialize_by_alias=True, populate_by_name=True)
+
+    id: str = Field(alias="_id")
+    user_id: str
+    video_url: str
+    title: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class ConversationPage(BaseModel):
+    conversations: List[ConversationSummary]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class ConceptList(BaseModel):
+    concepts: List[str]
+
+
+class QueryAnswer(BaseModel):
+    answer: str
+    timestamp: str = "00:00:00"
+
+
+class QuizQuestion(BaseModel):
+    question: str
+    options: List[str]
+    correct_option: str
+    timestamp: str = "00:00:00"
+
+
+class Quiz(BaseModel):
+    questions: List[QuizQuestion]
+
+
+class FeedbackClassification(BaseModel):
+    worth_remembering: bool
+    preference_summary: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class ConceptNote(BaseModel):
+    concept: str
+    timestamp: str = "00:00:00"
+    explanation: str
+
+
+class ConceptNotes(BaseModel):
+    notes: List[ConceptNote]
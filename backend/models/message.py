@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
@@ -21,3 +21,8 @@ class MessageResponse(BaseModel):
     message_type: str
     timestamp: datetime
     metadata: Optional[Dict[str, Any]] = None
+
+
+class MessagePage(BaseModel):
+    messages: List[MessageResponse]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from services.metrics import metrics_registry
+
+
+cache_entries = metrics_registry.gauge("cache_entries", "Number of entries held by an in-memory cache")
+cache_bytes = metrics_registry.gauge("cache_bytes", "Estimated bytes held by an in-memory cache")
+cache_evictions = metrics_registry.counter(
+    "cache_evictions_total", "Entries evicted from an in-memory cache"
+)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count, estimated size and idle TTL."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof or (lambda value: 0)
+        self._on_evict = on_evict
+        self._lock = threading.RLock()
+        # key -> (value, size, last_access)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as recently used"""
+        evicted = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, size, last_access = entry
+            now = time.monotonic()
+            if self.ttl_seconds is not None and now - last_access > self.ttl_seconds:
+                evicted.append(self._remove(key, "ttl"))
+                value = default
+            else:
+                self._entries[key] = (value, size, now)
+                self._entries.move_to_end(key)
+            self._publish()
+        self._notify(evicted)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Insert or replace a value, evicting least recently used entries if over budget"""
+        size = self._sizeof(value)
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                evicted.append(self._remove(key, None))
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Never cache a single value that would blow the whole budget
+                cache_evictions.inc(cache=self.name, reason="oversize")
+            else:
+                self._entries[key] = (value, size, time.monotonic())
+                self._total_bytes += size
+                evicted.extend(self._enforce_limits())
+            self._publish()
+        self._notify([item for item in evicted if item[2] is not None])
+
+    def items(self) -> list:
+        """Snapshot of (key, value) pairs, least recently used first"""
+        with self._lock:
+            return [(key, entry[0]) for key, entry in self._entries.items()]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a value without counting it as an eviction"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            _, value, _ = self._remove(key, None)
+            self._publish()
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self._publish()
+
+    def purge_expired(self) -> int:
+        """Drop every entry that has been idle for longer than the TTL"""
+        if self.ttl_seconds is None:
+            return 0
+        evicted = []
+        with self._lock:
+            cutoff = time.monotonic() - self.ttl_seconds
+            for key, (_, _, last_access) in list(self._entries.items()):
+                if last_access >= cutoff:
+                    # Entries are ordered by recency, so the rest are fresher
+                    break
+                evicted.append(self._remove(key, "ttl"))
+            self._publish()
+        self._notify(evicted)
+        return len(evicted)
+
+    def _enforce_limits(self) -> list:
+        evicted = []
+        now = time.monotonic()
+        while self._entries:
+            key, (_, _, last_access) = next(iter(self._entries.items()))
+            if self.ttl_seconds is not None and now - last_access > self.ttl_seconds:
+                evicted.append(self._remove(key, "ttl"))
+            elif self.max_entries is not None and len(self._entries) > self.max_entries:
+                evicted.append(self._remove(key, "lru"))
+            elif self.max_bytes is not None and self._total_bytes > self.max_bytes:
+                evicted.append(self._remove(key, "size"))
+            else:
+                break
+        return evicted
+
+    def _remove(self, key: Hashable, reason: Optional[str]) -> tuple:
+        value, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        if reason:
+            cache_evictions.inc(cache=self.name, reason=reason)
+        return key, value, reason
+
+    def _publish(self):
+        cache_entries.set(len(self._entries), cache=self.name)
+        cache_bytes.set(self._total_bytes, cache=self.name)
+
+    def _notify(self, evicted: list):
+        if not self._on_evict:
+            return
+        for key, value, _ in evicted:
+            try:
+                self._on_evict(key, value)
+            except Exception as e:
+                print(f"Error in {self.name} eviction callback: {e}")
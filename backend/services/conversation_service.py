@@ -1,9 +1,25 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
 from services.database import mongodb_service
-from models.conversation import ConversationCreate, ConversationResponse
+from models.conversation import (
+    ConversationCreate,
+    ConversationResponse,
+    ConversationSummary,
+    ConversationPage,
+)
+from services.pagination import encode_cursor, keyset_filter, utc_now_ms
+from services.serialization import from_document, from_documents
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 
+# Fields needed to list conversations; concepts and notes are fetched per conversation
+SUMMARY_PROJECTION = {
+    "user_id": 1,
+    "video_url": 1,
+    "title": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
 
 class AsyncConversationService:
     async def create_conversation(
@@ -15,23 +31,21 @@ class AsyncConversationService:
 
             # Prepare conversation document
             conversation_dict = conversation_data.dict()
+            now = utc_now_ms()
             conversation_dict.update(
                 {
                     "notes_url": None,
                     "concepts": [],
-                    "created_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow(),
+                    "created_at": now,
+                    "updated_at": now,
                 }
             )
 
             result = await collection.insert_one(conversation_dict)
 
-            # Return created conversation
-            created_conversation = await collection.find_one(
-                {"_id": result.inserted_id}
-            )
-            created_conversation["_id"] = str(created_conversation["_id"])
-            return ConversationResponse(**created_conversation)
+            # Build the response from what was written instead of reading it back
+            conversation_dict["_id"] = result.inserted_id
+            return from_document(ConversationResponse, conversation_dict)
 
         except Exception as e:
             raise Exception(f"Failed to create conversation: {str(e)}")
@@ -45,8 +59,7 @@ class AsyncConversationService:
             conversation = await collection.find_one({"_id": ObjectId(conversation_id)})
 
             if conversation:
-                conversation["_id"] = str(conversation["_id"])
-                return ConversationResponse(**conversation)
+                return from_document(ConversationResponse, conversation)
             return None
 
         except Exception as e:
@@ -63,8 +76,7 @@ class AsyncConversationService:
             )
 
             if conversation:
-                conversation["_id"] = str(conversation["_id"])
-                return ConversationResponse(**conversation)
+                return from_document(ConversationResponse, conversation)
             return None
 
         except Exception as e:
@@ -75,16 +87,38 @@ class AsyncConversationService:
         try:
             collection = mongodb_service.get_collection("conversations")
             cursor = collection.find({"user_id": user_id}).sort("created_at", -1)
+            return from_documents(ConversationResponse, await cursor.to_list(length=None))
+
+        except Exception as e:
+            raise Exception(f"Failed to get user conversations: {str(e)}")
+
+    async def get_user_conversation_summaries(
+        self, user_id: str, limit: int = 50, cursor: Optional[str] = None
+    ) -> ConversationPage:
+        """Get a page of a user's conversation summaries, newest first, continuing from the cursor"""
+        try:
+            collection = mongodb_service.get_collection("conversations")
+            query = {"user_id": user_id, **keyset_filter("created_at", cursor, descending=True)}
+            docs = (
+                await collection.find(query, SUMMARY_PROJECTION)
+                .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+                .limit(limit + 1)
+                .to_list(length=limit + 1)
+            )
 
-            conversations = []
-            async for conversation_doc in cursor:
-                conversation_doc["_id"] = str(conversation_doc["_id"])
-                conversations.append(ConversationResponse(**conversation_doc))
+            next_cursor = None
+            if len(docs) > limit:
+                docs = docs[:limit]
+                next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"])
 
-            return conversations
+            return ConversationPage.model_construct(
+                conversations=from_documents(ConversationSummary, docs), next_cursor=next_cursor
+            )
 
+        except ValueError:
+            raise
         except Exception as e:
-            raise Exception(f"Failed to get user conversations: {str(e)}")
+            raise Exception(f"Failed to get user conversation summaries: {str(e)}")
 
     async def update_conversation(
         self, conversation_id: str, notes_url: Optional[str] = None, concepts: Optional[List[str]] = None
@@ -101,12 +135,14 @@ class AsyncConversationService:
 
             update_data = {"$set": update_fields}
 
-            result = await collection.update_one(
-                {"_id": ObjectId(conversation_id)}, update_data
+            conversation = await collection.find_one_and_update(
+                {"_id": ObjectId(conversation_id)},
+                update_data,
+                return_document=ReturnDocument.AFTER,
             )
 
-            if result.modified_count > 0 or result.matched_count > 0:
-                return await self.get_conversation(conversation_id)
+            if conversation:
+                return from_document(ConversationResponse, conversation)
             return None
 
         except Exception as e:
@@ -114,3 +150,13 @@ class AsyncConversationService:
 
 
 conversation_service = AsyncConversationService()
+
+mongodb_service.register_indexes(
+    "conversations",
+    [
+        # find_by_video_url
+        IndexModel([("user_id", ASCENDING), ("video_url", ASCENDING)]),
+        # get_user_conversations(_summaries): filter user_id, sort (created_at, _id) desc
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+)
@@ -1,24 +1,61 @@
-from pymongo import ASCENDING
+from pymongo import IndexModel
 from pymongo.errors import ConnectionFailure, DuplicateKeyError
 from motor.motor_asyncio import AsyncIOMotorClient
 from motor.core import AgnosticDatabase, AgnosticCollection
 import os
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Dict, List, Optional
+
+from services.mongo_monitoring import command_latency_listener
 
 load_dotenv()
 
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = os.getenv("MONGODB_MAX_IDLE_TIME_MS")
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "10000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+# Unset means no socket timeout, the driver default
+MONGODB_SOCKET_TIMEOUT_MS = os.getenv("MONGODB_SOCKET_TIMEOUT_MS")
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+# Comma-separated, in order of preference, e.g. "zstd,snappy,zlib"; zstd and snappy need extra packages
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "")
+MONGODB_COMMAND_MONITORING = os.getenv("MONGODB_COMMAND_MONITORING", "true").lower() == "true"
+
+
+def client_options() -> dict:
+    """AsyncIOMotorClient keyword arguments built from the MONGODB_* settings"""
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if MONGODB_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = int(MONGODB_MAX_IDLE_TIME_MS)
+    if MONGODB_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = int(MONGODB_SOCKET_TIMEOUT_MS)
+    if MONGODB_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = int(MONGODB_WAIT_QUEUE_TIMEOUT_MS)
+    if MONGODB_COMPRESSORS:
+        options["compressors"] = MONGODB_COMPRESSORS
+    if MONGODB_COMMAND_MONITORING:
+        options["event_listeners"] = [command_latency_listener]
+    return options
+
 
 class AsyncMongoDBService:
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.db: Optional[AgnosticDatabase] = None
         self.connection_string = os.getenv("MONGODB_CONNECTION_STRING")
+        # collection name -> indexes declared by the services that query it
+        self.indexes: Dict[str, List[IndexModel]] = {}
 
     async def connect(self):
         """Connect to MongoDB using AsyncIOMotorClient"""
         try:
-            self.client = AsyncIOMotorClient(self.connection_string)
+            self.client = AsyncIOMotorClient(self.connection_string, **client_options())
             # Test connection
             await self.client.admin.command("ping")
             self.db = self.client.default
@@ -34,45 +71,26 @@ class AsyncMongoDBService:
             self.client.close()
             print("Disconnected from MongoDB")
 
+    def register_indexes(self, collection: str, indexes: List[IndexModel]):
+        """Declare indexes a service relies on; they are ensured at startup"""
+        self.indexes.setdefault(collection, []).extend(indexes)
+
     async def create_indexes(self):
-        """Create necessary indexes for performance"""
+        """Idempotently create every registered index"""
         if self.db is None:
             raise RuntimeError("Database not connected")
 
-        try:
-            # Users collection indexes
-            users_collection = self.db.users
-            await users_collection.create_index("email", unique=True)
-            print("Created unique index on user email.")
-
-            # Conversations collection indexes
-            conversations_collection = self.db.conversations
-            await conversations_collection.create_index("user_id")
-
-            # Add composite index for efficient (user_id, video_url) lookups
-            try:
-                await conversations_collection.create_index(
-                    [("user_id", ASCENDING), ("video_url", ASCENDING)]
-                )
-                print("Created composite index on (user_id, video_url)")
-            except Exception as e:
-                # Graceful handling if index already exists or creation fails
-                print(
-                    f"Warning: Failed to create composite index (user_id, video_url): {e}"
-                )
-                print("Continuing without composite index - URL lookups may be slower")
-
-            # Messages collection indexes
-            messages_collection = self.db.messages
-            await messages_collection.create_index("conversation_id")
-            await messages_collection.create_index(
-                [("user_id", ASCENDING), ("timestamp", -1)]
-            )
-
-            print("Database indexes created successfully")
-        except Exception as e:
-            print(f"Failed to create indexes: {e}")
-            raise
+        for collection, indexes in self.indexes.items():
+            for index in indexes:
+                name = index.document["name"]
+                try:
+                    await self.db[collection].create_indexes([index])
+                except Exception as e:
+                    # Graceful handling of conflicting existing indexes or duplicate data
+                    print(f"Warning: Failed to create index {collection}.{name}: {e}")
+                    print("Continuing without it - queries relying on it may be slower")
+
+        print("Database indexes ensured")
 
     def get_collection(self, name: str) -> AgnosticCollection:
         """Get async collection"""
@@ -1,16 +1,97 @@
 import os
-import json
+import re
 import uuid
 import asyncio
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from vertexai import agent_engines
-from google.adk import Agent,Runner
-from google.adk.memory.vertex_ai_memory_bank_service import VertexAiMemoryBankService
-from google.adk.sessions.vertex_ai_session_service import VertexAiSessionService
-from google.adk.tools.preload_memory_tool import PreloadMemoryTool
-from google.genai import types
+from typing import TYPE_CHECKING, List, Optional
+from bson import ObjectId
 from services.database import mongodb_service
+from services.memory_store import user_memory_store
+from services.user_service import invalidate_cached_user
+from services.structured_output import generate_structured
+from services.cache import LRUCache
+from services.metrics import metrics_registry
+from services.tracing import span, timed
+from services.vertex import ensure_vertexai
+from models.llm import FeedbackClassification
+
+if TYPE_CHECKING:
+    from google.adk import Agent
+    from vertexai.generative_models import GenerativeModel
+
+NOT_STORED_MESSAGE = "Feedback acknowledged but not stored as a preference."
+FEEDBACK_RUNNER_POOL_SIZE = int(os.getenv("FEEDBACK_RUNNER_POOL_SIZE", "100"))
+FEEDBACK_RUNNER_IDLE_SECONDS = float(os.getenv("FEEDBACK_RUNNER_IDLE_SECONDS", "900"))
+FEEDBACK_PRECLASSIFIER = os.getenv("FEEDBACK_PRECLASSIFIER", "1") == "1"
+
+preclassifier_decisions = metrics_registry.counter(
+    "feedback_preclassifier_decisions_total",
+    "Local feedback pre-classifier decisions (negative skips the LLM, escalated does not)",
+)
+
+
+class FeedbackPreClassifier:
+    """Lexical first-stage classifier that skips the LLM for feedback that is clearly not a preference.
+
+    Each matching rule adds its weight to a score. Only clear chatter (score at or below
+    the negative threshold) is decided locally; everything else, including anything that
+    might be a preference, is escalated to the LLM. Lexical rules cannot tell a preference
+    from a question, a one-off request or a negation ("I don't like it when..."), so they
+    never store anything. POSITIVE_RULES are preference signals that keep a message with
+    chatter words in it ("too tired to follow, keep it short") from being skipped, and a
+    message with any PREFERENCE_CUES match is always escalated: a single chatter word
+    ("I'm bored by the long intro, skip to the point") must not be enough to drop it.
+    """
+
+    POSITIVE_RULES = [
+        (r"\bi (really |much |strongly )?(prefer|learn better|understand better|like it when|need more|want more)\b", 3.0),
+        (r"\b(explain|use|give|show|keep|make|add|include)\b.{0,40}\b(simple|simpler|analog\w*|examples?|short|shorter|bullet\w*|step[- ]by[- ]step|diagrams?|visual\w*|slow\w*|detail\w*|summar\w*)", 3.0),
+        (r"\b(hard|difficult|confusing|confused|struggle|struggling|can'?t follow|cannot follow|overwhelm\w*)\b", 1.5),
+        (r"\bi'?m an? .{0,30}\b(student|engineer|developer|beginner|teacher|nurse|doctor|researcher)\b|\bi am an? .{0,30}\b(student|engineer|developer|beginner|teacher|nurse|doctor|researcher)\b", 2.5),
+        (r"\b(first|native) language\b|\bnon-?native\b", 3.0),
+        (r"\btoo (fast|slow|long|short|technical|complex|complicated|basic|advanced)\b", 2.5),
+        (r"\b(my goal|preparing for|studying for|my exam)\b", 2.0),
+        (r"\b(always|never|please|don'?t|do not)\b", 0.5),
+        (r"\b(focus on|more on|less on)\b", 1.5),
+    ]
+    NEGATIVE_RULES = [
+        (r"\b(weather|sandwich|eating|lunch|dinner|breakfast|coffee|sleepy|tired|bored|hungry|sunny|raining)\b", -3.0),
+        (r"^\W*(hi|hello|hey|thanks|thank you|thx|ok|okay|cool|nice|lol|great|awesome|good job|wow|test(ing)?)\W*$", -4.0),
+        (r"\b(this|the) video is \d+", -3.0),
+        (r"\b(today|right now|at the moment)\b", -1.0),
+    ]
+    NEGATIVE_THRESHOLD = -2.5
+    # Imperatives, struggle and pacing words: a message with any of these is never skipped locally
+    PREFERENCE_CUES = [
+        r"\b(skip|keep|make|explain|use|give|show|add|include|focus|stop|avoid|less|more)\b",
+        r"\b(confus\w*|hard|difficult|struggl\w*|lost|follow|understand\w*|overwhelm\w*)\b",
+        r"\btoo (fast|slow|long|short|technical|complex|complicated|basic|advanced)\b|\b(longer|shorter|simpler|slower|faster)\b",
+        r"\b(prefer\w*|like|love|hate|want|need|wish)\b",
+    ]
+
+    def __init__(self):
+        self._positive = [(re.compile(p, re.IGNORECASE), w) for p, w in self.POSITIVE_RULES]
+        self._negative = [(re.compile(p, re.IGNORECASE), w) for p, w in self.NEGATIVE_RULES]
+        self._cues = [re.compile(p, re.IGNORECASE) for p in self.PREFERENCE_CUES]
+
+    def score(self, text: str) -> float:
+        text = text.strip()
+        score = sum(w for rule, w in self._positive if rule.search(text))
+        score += sum(w for rule, w in self._negative if rule.search(text))
+        if len(text.split()) < 3 and score <= 0:
+            score -= 1.0
+        return score
+
+    def classify(self, text: str) -> Optional[FeedbackClassification]:
+        """Return a local "not worth remembering" decision, or None to escalate to the LLM"""
+        if any(cue.search(text) for cue in self._cues):
+            return None
+        score = self.score(text)
+        if score <= self.NEGATIVE_THRESHOLD:
+            return FeedbackClassification(
+                worth_remembering=False,
+                reason=f"local pre-classifier (score {score:.1f})",
+            )
+        return None
 
 
 class FeedbackAgent:
@@ -18,25 +99,22 @@ class FeedbackAgent:
         self.project = os.getenv("GCP_PROJECT_ID")
         self.location = os.getenv("GCP_LOCATION", "us-central1")
 
-        if self.project:
-            vertexai.init(project=self.project, location=self.location)
-
         self.model_name = "gemini-1.5-pro"
+        self._classifier_model = None
+        self.pre_classifier = FeedbackPreClassifier() if FEEDBACK_PRECLASSIFIER else None
+
+        # user_id -> (Runner, app_name) bound to the user's agent engine
+        self._runners = LRUCache(
+            "feedback_runners",
+            max_entries=FEEDBACK_RUNNER_POOL_SIZE,
+            ttl_seconds=FEEDBACK_RUNNER_IDLE_SECONDS,
+        )
+        # user_id -> in-flight runner creation, so concurrent feedback shares one engine
+        self._runner_tasks = {}
         # We'll use a consistent name for the agent logic, but the engine is unique
         self.agent_name = "feedback_assistant"
-
-        # Define ADK Agent Template
-        self.agent = Agent(
-            model=self.model_name,
-            name=self.agent_name,
-            instruction="""You are a helpful assistant with perfect memory.
-                Instructions:
-                - Use the context to personalize responses
-                - Naturally reference past conversations when relevant
-                - Build upon previous knowledge about the user
-                - If using semantic search, the memories shown are the most relevant to the current query""",
-            tools=[PreloadMemoryTool()],
-        )
+        # ADK and the Vertex AI SDK are slow to import, so the agent is built on first use
+        self._agent = None
 
         self.classification_prompt = """
 You are a specialized AI agent focused on student success. Your goal is to analyze user feedback and decide if it reveals a persistent learning preference, a specific difficulty, or a personal context that should be remembered to improve future tutoring sessions.
@@ -62,10 +140,74 @@ Output only a JSON object with:
 }
 """
 
+    @property
+    def agent(self) -> "Agent":
+        """ADK Agent template shared by every user's runner."""
+        if self._agent is None:
+            from google.adk import Agent
+            from google.adk.tools.preload_memory_tool import PreloadMemoryTool
+
+            self._agent = Agent(
+                model=self.model_name,
+                name=self.agent_name,
+                instruction="""You are a helpful assistant with perfect memory.
+                Instructions:
+                - Use the context to personalize responses
+                - Naturally reference past conversations when relevant
+                - Build upon previous knowledge about the user
+                - If using semantic search, the memories shown are the most relevant to the current query""",
+                tools=[PreloadMemoryTool()],
+            )
+        return self._agent
+
+    @property
+    def classifier_model(self) -> "GenerativeModel":
+        """Shared model instance used for feedback classification."""
+        if self._classifier_model is None:
+            from vertexai.generative_models import GenerativeModel
+
+            ensure_vertexai()
+            self._classifier_model = GenerativeModel(self.model_name)
+        return self._classifier_model
+
+    def warm_up(self):
+        """Import ADK and build the agent and classifier ahead of the first feedback."""
+        self.agent
+        self.classifier_model
+        from google.adk.memory.vertex_ai_memory_bank_service import VertexAiMemoryBankService  # noqa: F401
+        from google.adk.sessions.vertex_ai_session_service import VertexAiSessionService  # noqa: F401
+
     async def _get_user_runner(self, user_id: str):
+        """Return the pooled Runner for the user, creating it at most once per user concurrently."""
+        cached = self._runners.get(user_id)
+        if cached is not None:
+            return cached
+
+        task = self._runner_tasks.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._create_user_runner(user_id))
+            self._runner_tasks[user_id] = task
+            task.add_done_callback(lambda _: self._runner_tasks.pop(user_id, None))
+        # Shield so a cancelled request does not abort creation for the other waiters
+        return await asyncio.shield(task)
+
+    def invalidate_user_runner(self, user_id: str):
+        """Drop the pooled runner, e.g. after the user's agent engine changed."""
+        self._runners.pop(user_id)
+
+    @timed("feedback.create_runner")
+    async def _create_user_runner(self, user_id: str):
         """Retrieve or create a reasoning engine for the user and return a Runner."""
+        from google.adk import Runner
+        from google.adk.memory.vertex_ai_memory_bank_service import VertexAiMemoryBankService
+        from google.adk.sessions.vertex_ai_session_service import VertexAiSessionService
+        from vertexai import agent_engines
+
+        ensure_vertexai()
         users_collection = mongodb_service.get_collection("users")
-        user_doc = await users_collection.find_one({"_id": user_id})
+        # User ids are the string form of the users collection's ObjectId _id
+        user_object_id = ObjectId(user_id)
+        user_doc = await users_collection.find_one({"_id": user_object_id})
 
         if not user_doc:
             # Fallback for transient users or create one if needed, 
@@ -77,19 +219,19 @@ Output only a JSON object with:
 
         if agent_id:
             try:
-                agent_engine = agent_engines.get(agent_id)
+                agent_engine = await asyncio.to_thread(agent_engines.get, agent_id)
             except Exception as e:
                 agent_id = None
 
         if not agent_id:
             try:
-                agent_engine = agent_engines.create()
+                agent_engine = await asyncio.to_thread(agent_engines.create)
                 agent_id = agent_engine.resource_name
                 await users_collection.update_one(
-                    {"_id": user_id},
+                    {"_id": user_object_id},
                     {"$set": {"agent_id": agent_id}},
-                    upsert=True
                 )
+                invalidate_cached_user(user_id=user_id)
             except Exception as e:
                 raise e
 
@@ -108,95 +250,106 @@ Output only a JSON object with:
 
         app_name = f"feedback_assistant_{user_id[:6]}"
 
-        return Runner(
+        runner = Runner(
             agent=self.agent,
             app_name=app_name,
             session_service=session_service,
             memory_service=memory_bank_service,
-        ), app_name
+        )
+        self._runners.set(user_id, (runner, app_name))
+        return runner, app_name
+
+    @timed("feedback.classify")
+    def classify_feedback(self, feedback_text: str) -> FeedbackClassification:
+        """Decide whether feedback is a preference worth remembering (may make a blocking LLM call)."""
+        if self.pre_classifier:
+            local = self.pre_classifier.classify(feedback_text)
+            if local is not None:
+                preclassifier_decisions.inc(decision="negative")
+                return local
+            preclassifier_decisions.inc(decision="escalated")
+
+        # Classification call using standard GenerativeModel for internal decision
+        prompt = f'{self.classification_prompt}\n\nUser Feedback: "{feedback_text}"'
+        return generate_structured(
+            self.classifier_model, prompt, FeedbackClassification, "feedback_classification"
+        )
+
+    @timed("feedback.store_preferences")
+    async def store_preferences(self, user_id: str, summaries: List[str]):
+        """Store one or more preference summaries in the user's Memory Bank and memory store."""
+        await self.write_memory_bank(user_id, summaries)
+        # Store in MongoDB as a backup/quick cache, deduplicated and bounded
+        await user_memory_store.add(user_id, summaries)
+
+    async def write_memory_bank(self, user_id: str, summaries: List[str]):
+        """Add preference summaries to the user's Memory Bank with a single session.
+
+        Not idempotent: every call adds the summaries again.
+        """
+        if not summaries:
+            return
+
+        from google.genai import types
+
+        # Get runner dynamically
+        runner, app_name = await self._get_user_runner(user_id)
+
+        # ADK memory storage process:
+        # 1. Create a session
+        session = await runner.session_service.create_session(
+            app_name=app_name,
+            user_id=user_id,
+        )
+
+        # 2. Add the preferences to the session history via a call
+        # This ensures the memory generation process has context.
+        if len(summaries) == 1:
+            note = f"Please note this preference: {summaries[0]}"
+        else:
+            note = "Please note these preferences:\n" + "\n".join(f"- {s}" for s in summaries)
+        with span("feedback.agent_run"):
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=session.id,
+                new_message=types.Content(
+                    role="user",
+                    parts=[types.Part(text=note)],
+                ),
+            ):
+                pass
+
+        # 3. Retrieve the session and add it to the Memory Bank
+        completed_session = await runner.session_service.get_session(
+            app_name=app_name, user_id=user_id, session_id=session.id
+        )
+        if completed_session:
+            with span("feedback.memory_bank_add"):
+                await runner.memory_service.add_session_to_memory(
+                    completed_session
+                )
 
     async def process_feedback(self, user_id: str, feedback_text: str):
         """Classify and potentially store user feedback in Memory Bank."""
 
         try:
-            # Classification call using standard GenerativeModel for internal decision
-            model = GenerativeModel(self.model_name)
-            prompt = f'{self.classification_prompt}\n\nUser Feedback: "{feedback_text}"'
-            response = model.generate_content(prompt)
-
-            # Parse LLM response
-            raw_text = response.text.strip()
-            if "```json" in raw_text:
-                raw_text = raw_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in raw_text:
-                raw_text = raw_text.split("```")[1].split("```")[0].strip()
-
-            result = json.loads(raw_text)
-
-            if result.get("worth_remembering"):
-                summary = result.get("preference_summary", feedback_text)
-
-                # Get runner dynamically
-                runner, app_name = await self._get_user_runner(user_id)
-
-                # ADK memory storage process:
-                # 1. Create a session
-                session = await runner.session_service.create_session(
-                    app_name=app_name,
-                    user_id=user_id,
-                )
-
-                # 2. Add the preference to the session history via a call
-                # This ensures the memory generation process has context.
-                async for event in runner.run_async(
-                    user_id=user_id,
-                    session_id=session.id,
-                    new_message=types.Content(
-                        role="user",
-                        parts=[
-                            types.Part(text=f"Please note this preference: {summary}")
-                        ],
-                    ),
-                ):
-                    pass
-
-                # 3. Retrieve the session and add it to the Memory Bank
-                completed_session = await runner.session_service.get_session(
-                    app_name=app_name, user_id=user_id, session_id=session.id
-                )
-                if completed_session:
-                    await runner.memory_service.add_session_to_memory(
-                        completed_session
-                    )
-
-                # Store in MongoDB as a backup/quick cache
-                user_memories_collection = mongodb_service.get_collection(
-                    "user_memories"
-                )
-                await user_memories_collection.update_one(
-                    {"user_id": user_id},
-                    {"$addToSet": {"memories": summary}},
-                    upsert=True,
-                )
+            result = await asyncio.to_thread(self.classify_feedback, feedback_text)
 
+            if result.worth_remembering:
+                summary = result.preference_summary or feedback_text
+                await self.store_preferences(user_id, [summary])
                 return True, f"Memory stored: {summary}"
             else:
-                return False, "Feedback acknowledged but not stored as a preference."
+                return False, NOT_STORED_MESSAGE
 
         except Exception as e:
             return False, f"Error processing feedback: {str(e)}"
 
+    @timed("feedback.get_user_memories")
     async def get_user_memories(self, user_id: str) -> str:
         """Retrieve stored memories for prompt injection."""
         try:
-            user_memories_collection = mongodb_service.get_collection("user_memories")
-            user_data = await user_memories_collection.find_one({"user_id": user_id})
-            if user_data and "memories" in user_data and user_data["memories"]:
-                memories_list = user_data["memories"]
-                return "Known User Preferences & Context:\n" + "\n".join(
-                    [f"- {m}" for m in memories_list]
-                )
-            return ""
+            return await user_memory_store.get_prompt_block(user_id)
         except Exception as e:
             print(f"ERROR retrieving memories: {e}")
             return ""
@@ -0,0 +1,343 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from services.feedback_agent import feedback_agent, FeedbackAgent, NOT_STORED_MESSAGE
+from services.memory_store import user_memory_store
+from services.llm_accounting import llm_accounting_scope
+from services.metrics import metrics_registry
+
+
+FEEDBACK_QUEUE_PATH = os.getenv("FEEDBACK_QUEUE_PATH", "feedback_queue.db")
+FEEDBACK_WORKERS = int(os.getenv("FEEDBACK_WORKERS", "2"))
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "20"))
+FEEDBACK_MAX_ATTEMPTS = int(os.getenv("FEEDBACK_MAX_ATTEMPTS", "3"))
+FEEDBACK_POLL_SECONDS = float(os.getenv("FEEDBACK_POLL_SECONDS", "5"))
+# A claimed job is only requeued once its lease expires. Leases are renewed every third
+# of this while the batch is in flight, so it only needs to outlast a stalled heartbeat
+FEEDBACK_LEASE_SECONDS = float(os.getenv("FEEDBACK_LEASE_SECONDS", "300"))
+
+feedback_jobs = metrics_registry.counter(
+    "feedback_jobs_total", "Feedback jobs by final outcome"
+)
+
+
+class FeedbackQueue:
+    """Durable SQLite-backed queue of feedback submissions awaiting processing."""
+
+    def __init__(self, path: str, lease_seconds: float = FEEDBACK_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # Identifies this process's claims among everyone sharing the file
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS feedback_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    feedback_text TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    stored INTEGER NOT NULL DEFAULT 0,
+                    message TEXT,
+                    summary TEXT,
+                    owner TEXT,
+                    lease_expires_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(feedback_jobs)")}
+            for column, column_type in (("summary", "TEXT"), ("owner", "TEXT"), ("lease_expires_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE feedback_jobs ADD COLUMN {column} {column_type}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_feedback_jobs_status ON feedback_jobs (status, created_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def enqueue(self, user_id: str, feedback_text: str) -> str:
+        """Persist a feedback submission and return its job id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO feedback_jobs (id, user_id, feedback_text, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, user_id, feedback_text, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT * FROM feedback_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def claim_batch(self, limit: int) -> List[dict]:
+        """Atomically lease up to limit queued jobs to this process and return them.
+
+        Each claim counts as an attempt, including claims of jobs whose lease expired.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT * FROM feedback_jobs WHERE status = 'queued' ORDER BY created_at LIMIT ?",
+                    (limit,),
+                ).fetchall()
+                now = time.time()
+                conn.executemany(
+                    "UPDATE feedback_jobs SET status = 'processing', attempts = attempts + 1, "
+                    "owner = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                    [(self.owner, now + self.lease_seconds, now, row["id"]) for row in rows],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [dict(row) for row in rows]
+
+    def renew(self, job_ids: List[str]) -> int:
+        """Extend this process's leases on jobs it is still processing; returns how many"""
+        now = time.time()
+        with self._lock:
+            return self._connection().executemany(
+                "UPDATE feedback_jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'processing' AND owner = ?",
+                [(now + self.lease_seconds, now, job_id, self.owner) for job_id in job_ids],
+            ).rowcount
+
+    def mark_stored(self, items: List[Tuple[str, str]]):
+        """Record (job_id, summary) pairs that reached the memory bank, so a retry skips the write.
+
+        Not limited to the owner: the write happened even if the lease was lost meanwhile.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection().executemany(
+                "UPDATE feedback_jobs SET stored = 1, summary = ?, updated_at = ? WHERE id = ?",
+                [(summary, now, job_id) for job_id, summary in items],
+            )
+
+    def release(self) -> int:
+        """Requeue the jobs this process holds, e.g. on shutdown, without using up an attempt"""
+        with self._lock:
+            return self._connection().execute(
+                "UPDATE feedback_jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE status = 'processing' AND owner = ?",
+                (time.time(), self.owner),
+            ).rowcount
+
+    def complete(self, job_id: str, stored: bool, message: str):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE feedback_jobs SET status = 'completed', stored = ?, message = ?, owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND owner = ?",
+                (int(stored), message, time.time(), job_id, self.owner),
+            )
+
+    def fail(self, job: dict, message: str):
+        """Requeue a failed job, or mark it failed once it ran out of attempts"""
+        # job is the row as claimed, before the claim counted the attempt
+        status = "failed" if job["attempts"] + 1 >= FEEDBACK_MAX_ATTEMPTS else "queued"
+        with self._lock:
+            self._connection().execute(
+                "UPDATE feedback_jobs SET status = ?, message = ?, owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ? AND owner = ?",
+                (status, message, time.time(), job["id"], self.owner),
+            )
+        return status
+
+    def requeue_expired(self) -> Tuple[int, int]:
+        """Requeue jobs whose lease expired (their worker crashed or hung).
+
+        Jobs that already used all their attempts are failed instead, so a job that keeps
+        crashing its worker is not retried forever. Returns (requeued, failed).
+        """
+        now = time.time()
+        expired = "status = 'processing' AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = conn.execute(
+                    "UPDATE feedback_jobs SET status = 'failed', message = 'Lease expired on every attempt', "
+                    f"owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE {expired} AND attempts >= ?",
+                    (now, now, FEEDBACK_MAX_ATTEMPTS),
+                ).rowcount
+                requeued = conn.execute(
+                    "UPDATE feedback_jobs SET status = 'queued', owner = NULL, lease_expires_at = NULL, "
+                    f"updated_at = ? WHERE {expired}",
+                    (now, now),
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return requeued, failed
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class FeedbackProcessor:
+    """Background workers that classify queued feedback and batch memory-bank writes per user."""
+
+    def __init__(self, queue: FeedbackQueue, agent: FeedbackAgent, workers: int, batch_size: int):
+        self.queue = queue
+        self.agent = agent
+        self.workers = workers
+        self.batch_size = batch_size
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        await self._requeue_expired()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand interrupted jobs straight back instead of leaving them until their lease expires
+        released = await asyncio.to_thread(self.queue.release)
+        if released:
+            print(f"Released {released} in-flight feedback jobs on shutdown")
+        self.queue.close()
+
+    async def submit(self, user_id: str, feedback_text: str) -> str:
+        """Queue feedback for background processing and return the job id"""
+        job_id = await asyncio.to_thread(self.queue.enqueue, user_id, feedback_text)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def _worker(self):
+        while True:
+            try:
+                jobs = await asyncio.to_thread(self.queue.claim_batch, self.batch_size)
+                if jobs:
+                    await self._process_batch(jobs)
+                    continue
+                # Idle: pick up jobs abandoned by crashed workers in any process
+                if await self._requeue_expired():
+                    continue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=FEEDBACK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Feedback worker error: {e}")
+                await asyncio.sleep(FEEDBACK_POLL_SECONDS)
+
+    async def _requeue_expired(self) -> int:
+        requeued, failed = await asyncio.to_thread(self.queue.requeue_expired)
+        if requeued or failed:
+            print(f"Feedback jobs with expired leases: {requeued} requeued, {failed} failed")
+        if failed:
+            feedback_jobs.inc(failed, outcome="failed")
+        return requeued
+
+    async def _process_batch(self, jobs: List[dict]):
+        heartbeat = asyncio.create_task(self._renew_leases([job["id"] for job in jobs]))
+        try:
+            with llm_accounting_scope("feedback_queue"):
+                await self._classify_and_store(jobs)
+        finally:
+            heartbeat.cancel()
+
+    async def _renew_leases(self, job_ids: List[str]):
+        """Keep the batch's leases alive so no worker reclaims jobs that are still in flight"""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.queue.renew, job_ids)
+            except Exception as e:
+                print(f"Error renewing feedback job leases: {e}")
+
+    async def _classify_and_store(self, jobs: List[dict]):
+        # user_id -> [(job, summary)] already in the memory bank, including from an earlier
+        # attempt of the job: writing those again would store the preference twice
+        in_memory_bank = defaultdict(list)
+        for job in jobs:
+            if job["stored"]:
+                in_memory_bank[job["user_id"]].append((job, job["summary"] or job["feedback_text"]))
+        jobs = [job for job in jobs if not job["stored"]]
+
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.agent.classify_feedback, job["feedback_text"]) for job in jobs),
+            return_exceptions=True,
+        )
+
+        to_store = defaultdict(list)  # user_id -> [(job, summary)]
+        for job, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                await self._fail(job, f"Error processing feedback: {str(result)}")
+            elif result.worth_remembering:
+                summary = result.preference_summary or job["feedback_text"]
+                to_store[job["user_id"]].append((job, summary))
+            else:
+                await asyncio.to_thread(self.queue.complete, job["id"], False, NOT_STORED_MESSAGE)
+                feedback_jobs.inc(outcome="not_stored")
+
+        # One memory-bank session per user for everything in this batch
+        for user_id, items in to_store.items():
+            try:
+                await self.agent.write_memory_bank(user_id, [summary for _, summary in items])
+            except Exception as e:
+                for job, _ in items:
+                    await self._fail(job, f"Error storing preference: {str(e)}")
+                continue
+            await asyncio.to_thread(
+                self.queue.mark_stored, [(job["id"], summary) for job, summary in items]
+            )
+            in_memory_bank[user_id].extend(items)
+
+        # The memory store deduplicates, so repeating this on a retry is harmless
+        for user_id, items in in_memory_bank.items():
+            try:
+                await user_memory_store.add(user_id, [summary for _, summary in items])
+            except Exception as e:
+                for job, _ in items:
+                    await self._fail(job, f"Error storing preference: {str(e)}")
+                continue
+            for job, summary in items:
+                await asyncio.to_thread(self.queue.complete, job["id"], True, f"Memory stored: {summary}")
+                feedback_jobs.inc(outcome="stored")
+
+    async def _fail(self, job: dict, message: str):
+        status = await asyncio.to_thread(self.queue.fail, job, message)
+        if status == "failed":
+            feedback_jobs.inc(outcome="failed")
+
+
+# Global instances
+feedback_queue = FeedbackQueue(FEEDBACK_QUEUE_PATH)
+feedback_processor = FeedbackProcessor(
+    feedback_queue, feedback_agent, FEEDBACK_WORKERS, FEEDBACK_BATCH_SIZE
+)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from google.auth import jwt as google_jwt
+
+
+# Overridable so verification can be exercised against a local stub server
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v3/userinfo")
+GOOGLE_TOKENINFO_URL = os.getenv("GOOGLE_TOKENINFO_URL", "https://www.googleapis.com/oauth2/v3/tokeninfo")
+GOOGLE_HTTP_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_HTTP_TIMEOUT_SECONDS", "5"))
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Used when the certs response carries no usable Cache-Control max-age
+DEFAULT_CERTS_MAX_AGE_SECONDS = 3600
+
+
+def parse_max_age(cache_control: Optional[str]) -> Optional[int]:
+    """Extract max-age seconds from a Cache-Control header value."""
+    if not cache_control:
+        return None
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return int(match.group(1)) if match else None
+
+
+class GoogleTokenVerifier:
+    """Async Google ID / access token verification with cached signing certs and a pooled HTTP client."""
+
+    def __init__(
+        self,
+        client_id: Optional[str],
+        certs_url: str = GOOGLE_CERTS_URL,
+        userinfo_url: str = GOOGLE_USERINFO_URL,
+        tokeninfo_url: str = GOOGLE_TOKENINFO_URL,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.client_id = client_id
+        self.certs_url = certs_url
+        self.userinfo_url = userinfo_url
+        self.tokeninfo_url = tokeninfo_url
+        self._client = http_client
+        self._certs: Optional[Dict[str, str]] = None
+        self._certs_expire_at = 0.0
+        self._certs_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=GOOGLE_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_certs(self, force_refresh: bool = False) -> Dict[str, str]:
+        """Return Google's signing certs, refetching only when the cached copy has expired"""
+        if not force_refresh and self._certs and time.monotonic() < self._certs_expire_at:
+            return self._certs
+
+        if self._certs_lock is None:
+            self._certs_lock = asyncio.Lock()
+        async with self._certs_lock:
+            # Another request may have refreshed while we waited for the lock
+            if not force_refresh and self._certs and time.monotonic() < self._certs_expire_at:
+                return self._certs
+            response = await self.client.get(self.certs_url)
+            response.raise_for_status()
+            max_age = parse_max_age(response.headers.get("cache-control"))
+            self._certs = response.json()
+            self._certs_expire_at = time.monotonic() + (
+                max_age if max_age is not None else DEFAULT_CERTS_MAX_AGE_SECONDS
+            )
+            return self._certs
+
+    async def verify_id_token(self, token: str) -> Dict[str, Any]:
+        """Verify an ID token's signature, audience and issuer against the cached certs"""
+        certs = await self.get_certs()
+        try:
+            claims = google_jwt.decode(token, certs=certs, audience=self.client_id)
+        except ValueError as e:
+            if "Certificate for key id" not in str(e):
+                raise
+            # Google rotated its keys before our cached copy expired
+            certs = await self.get_certs(force_refresh=True)
+            claims = google_jwt.decode(token, certs=certs, audience=self.client_id)
+
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+        return dict(claims)
+
+    async def verify_access_token(self, token: str) -> Dict[str, Any]:
+        """Resolve an access token through the userinfo and tokeninfo endpoints concurrently"""
+        userinfo_resp, tokeninfo_resp = await asyncio.gather(
+            self.client.get(self.userinfo_url, headers={"Authorization": f"Bearer {token}"}),
+            self.client.get(self.tokeninfo_url, params={"access_token": token}),
+        )
+        if userinfo_resp.status_code != 200:
+            raise ValueError("Invalid Access Token")
+
+        if tokeninfo_resp.status_code == 200:
+            token_info = tokeninfo_resp.json()
+            if token_info.get("aud") != self.client_id:
+                # Logged rather than rejected: access token audiences are not always our client id
+                print(f"ERROR: Token audience mismatch. Expected {self.client_id}, got {token_info.get('aud')}")
+
+        return userinfo_resp.json()
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Verify the token as an ID token, falling back to access token verification"""
+        try:
+            return await self.verify_id_token(token)
+        except Exception:
+            pass
+        return await self.verify_access_token(token)
@@ -0,0 +1,107 @@
+import json
+from typing import Iterable, Iterator, List
+
+from services.metrics import metrics_registry
+
+
+json_stream_errors = metrics_registry.counter(
+    "llm_json_stream_item_errors_total", "Streamed JSON items that could not be decoded"
+)
+
+
+class JSONArrayStreamParser:
+    """Incrementally extract the objects of the first JSON array in LLM output.
+
+    Code fences, leading prose and wrapper objects such as {"questions": [...]}
+    are skipped; only a "[" followed by "{" starts the array, so brackets in
+    prose such as "see [1]" are ignored; each element object is decoded as soon as its closing brace
+    arrives, so a malformed or truncated tail only loses the items it touches.
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_depth = None
+        # Depth of a "[" waiting to see whether an object follows it
+        self._candidate_depth = None
+        self._item_start = None
+        self.done = False
+        self.errors = 0
+
+    def feed(self, text: str) -> List[dict]:
+        """Consume the next chunk of model output and return any completed items"""
+        if self.done or not text:
+            return []
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._candidate_depth is not None and not self._in_string and not char.isspace():
+                if char == "{":
+                    self._array_depth = self._candidate_depth
+                self._candidate_depth = None
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "[" and self._array_depth is None:
+                    self._candidate_depth = self._depth + 1
+                elif char == "{" and self._depth == self._array_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._item_start is not None and self._depth == self._array_depth:
+                    item = self._decode(buffer[self._item_start : i + 1])
+                    if item is not None:
+                        items.append(item)
+                    self._item_start = None
+                elif char == "]" and self._array_depth is not None and self._depth < self._array_depth:
+                    self.done = True
+                    break
+            i += 1
+        self._compact(i)
+        return items
+
+    def _decode(self, raw: str):
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError:
+            self.errors += 1
+            json_stream_errors.inc(parser=self.name)
+            return None
+        return item if isinstance(item, dict) else None
+
+    def _compact(self, pos: int):
+        # Keep only the unfinished item so long streams do not grow the buffer
+        keep_from = self._item_start if self._item_start is not None else pos
+        self._buffer = self._buffer[keep_from:]
+        self._pos = pos - keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+
+
+def iter_json_array_items(chunks: Iterable[str], name: str = "default") -> Iterator[dict]:
+    """Yield array element objects from a stream of text chunks as they complete."""
+    parser = JSONArrayStreamParser(name)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            break
+
+
+def parse_json_array(text: str, name: str = "default") -> List[dict]:
+    """Parse the element objects out of a complete LLM response."""
+    return list(iter_json_array_items([text], name))
@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from services.metrics import metrics_registry
+
+
+# USD per million tokens as (prompt, output); override or extend with LLM_PRICES as
+# JSON, e.g. {"gemini-2.5-flash": [0.3, 2.5]}
+DEFAULT_LLM_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+LLM_PRICES = {
+    **DEFAULT_LLM_PRICES,
+    **{model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES", "{}")).items()},
+}
+LLM_USAGE_HEADER = "x-llm-usage"
+# Rough characters per token, used when a response carries no usage metadata
+CHARS_PER_TOKEN = 4
+
+llm_calls = metrics_registry.counter(
+    "llm_calls_total", "Model calls by model, endpoint, operation and outcome"
+)
+llm_tokens = metrics_registry.counter(
+    "llm_tokens_total", "Model tokens by model, endpoint, operation and kind (prompt/output)"
+)
+llm_cost = metrics_registry.counter(
+    "llm_cost_usd_total", "Estimated model spend in USD by model, endpoint and operation"
+)
+llm_duration = metrics_registry.histogram(
+    "llm_call_duration_seconds", "Model call latency by model, endpoint and operation"
+)
+
+
+class RequestLLMUsage:
+    """LLM usage accumulated over one HTTP request or background job."""
+
+    def __init__(self, endpoint: str, scope: Optional[dict] = None):
+        self._endpoint = endpoint
+        # Routing fills in the endpoint after the middleware has started the request
+        self._scope = scope
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.duration_seconds = 0.0
+
+    @property
+    def endpoint(self) -> str:
+        if self._scope is not None:
+            endpoint = self._scope.get("endpoint")
+            if endpoint is not None:
+                return getattr(endpoint, "__name__", self._endpoint)
+        return self._endpoint
+
+    def add(self, prompt_tokens: int, output_tokens: int, cost_usd: float, duration_seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            self.cost_usd += cost_usd
+            self.duration_seconds += duration_seconds
+
+    def header_value(self) -> str:
+        return (
+            f"calls={self.calls}; prompt_tokens={self.prompt_tokens}; "
+            f"output_tokens={self.output_tokens}; cost_usd={self.cost_usd:.6f}; "
+            f"duration_ms={self.duration_seconds * 1000:.0f}"
+        )
+
+
+_current_usage: ContextVar[Optional[RequestLLMUsage]] = ContextVar("llm_usage", default=None)
+
+
+def current_usage() -> Optional[RequestLLMUsage]:
+    return _current_usage.get()
+
+
+@contextmanager
+def llm_accounting_scope(endpoint: str, scope: Optional[dict] = None) -> Iterator[RequestLLMUsage]:
+    """Attribute the model calls made inside the block (including to_thread work) to an endpoint"""
+    usage = RequestLLMUsage(endpoint, scope)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def model_name(model) -> str:
+    name = getattr(model, "_model_name", None) or getattr(model, "model_name", None) or "unknown"
+    return name.rsplit("/", 1)[-1]
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def _usage_tokens(response) -> Optional[tuple]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    prompt = getattr(usage, "prompt_token_count", 0) or 0
+    output = getattr(usage, "candidates_token_count", 0) or 0
+    if not prompt and not output:
+        return None
+    return prompt, output
+
+
+def _response_text(response) -> str:
+    try:
+        return response.text or ""
+    except Exception:
+        return ""
+
+
+def _prompt_text(contents: Any) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "".join(_prompt_text(part) for part in contents)
+    return ""
+
+
+def record_call(
+    model: str,
+    operation: str,
+    prompt_tokens: int,
+    output_tokens: int,
+    duration_seconds: float,
+    outcome: str = "ok",
+):
+    """Record one model call in the metrics and the current request's usage"""
+    usage = current_usage()
+    endpoint = usage.endpoint if usage else "background"
+    input_price, output_price = LLM_PRICES.get(model, (0.0, 0.0))
+    cost = (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+    labels = {"model": model, "endpoint": endpoint, "operation": operation}
+    llm_calls.inc(outcome=outcome, **labels)
+    llm_tokens.inc(prompt_tokens, kind="prompt", **labels)
+    llm_tokens.inc(output_tokens, kind="output", **labels)
+    llm_cost.inc(cost, **labels)
+    llm_duration.observe(duration_seconds, **labels)
+    if usage is not None:
+        usage.add(prompt_tokens, output_tokens, cost, duration_seconds)
+
+
+def generate_content(model, contents, operation: str, **kwargs):
+    """Call model.generate_content and account for tokens, latency and cost.
+
+    Token counts come from the response usage metadata, falling back to a character
+    based estimate. Streaming calls are accounted once the stream is exhausted.
+    """
+    if kwargs.get("stream"):
+        return _generate_content_stream(model, contents, operation, **kwargs)
+
+    name = model_name(model)
+    start = time.perf_counter()
+    try:
+        response = model.generate_content(contents, **kwargs)
+    except Exception:
+        prompt_tokens = estimate_tokens(_prompt_text(contents))
+        record_call(name, operation, prompt_tokens, 0, time.perf_counter() - start, "error")
+        raise
+    duration = time.perf_counter() - start
+
+    tokens = _usage_tokens(response)
+    if tokens is None:
+        tokens = estimate_tokens(_prompt_text(contents)), estimate_tokens(_response_text(response))
+    record_call(name, operation, tokens[0], tokens[1], duration)
+    return response
+
+
+def _generate_content_stream(model, contents, operation: str, **kwargs):
+    name = model_name(model)
+    start = time.perf_counter()
+    tokens = None
+    output_chars = []
+    outcome = "ok"
+    try:
+        for chunk in model.generate_content(contents, **kwargs):
+            # Usage metadata is cumulative; the last chunk carries the totals
+            tokens = _usage_tokens(chunk) or tokens
+            output_chars.append(_response_text(chunk))
+            yield chunk
+    except GeneratorExit:
+        outcome = "cancelled"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        if tokens is None:
+            tokens = estimate_tokens(_prompt_text(contents)), estimate_tokens("".join(output_chars))
+        record_call(name, operation, tokens[0], tokens[1], time.perf_counter() - start, outcome)
+
+
+class LLMAccountingMiddleware:
+    """Pure ASGI middleware that scopes LLM accounting to each HTTP request.
+
+    Adds an x-llm-usage response header summarising the calls made before the response
+    started; calls made while a streaming body is produced only reach the metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with llm_accounting_scope(scope.get("path", "unknown"), scope) as usage:
+
+            async def send_with_usage(message):
+                if message["type"] == "http.response.start" and usage.calls:
+                    headers = list(message.get("headers", []))
+                    headers.append((LLM_USAGE_HEADER.encode(), usage.header_value().encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_usage)
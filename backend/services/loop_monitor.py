@@ -0,0 +1,119 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from services.metrics import metrics_registry
+
+
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+# Debug mode runs a watchdog thread that captures the stack of whatever is blocking the loop
+LOOP_MONITOR_DEBUG = os.getenv("LOOP_MONITOR_DEBUG", "false").lower() == "true"
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+loop_lag = metrics_registry.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer scheduled every LOOP_MONITOR_INTERVAL_MS",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+loop_lag_last = metrics_registry.gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+loop_blocks = metrics_registry.counter(
+    "event_loop_blocked_total",
+    "Event loop stalls longer than LOOP_BLOCK_THRESHOLD_MS by blocking app code location (debug mode)",
+)
+
+
+def blocking_location(stack: traceback.StackSummary) -> str:
+    """Innermost frame in the app's own code, which is where the blocking call is made"""
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(APP_ROOT) and f"{os.sep}site-packages{os.sep}" not in path:
+            return f"{os.path.relpath(path, APP_ROOT)}:{frame.lineno} {frame.name}"
+    return "unknown"
+
+
+class LoopMonitor:
+    """Measures event loop lag continuously and, in debug mode, reports what blocks it.
+
+    Lag is how much later than scheduled a periodic timer fires, i.e. how long ready
+    callbacks had to wait. The debug watchdog notices when that timer stops firing for
+    longer than the threshold and captures the loop thread's stack while it is stuck.
+    """
+
+    def __init__(
+        self,
+        interval_ms: float = LOOP_MONITOR_INTERVAL_MS,
+        debug: bool = LOOP_MONITOR_DEBUG,
+        threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+    ):
+        self.interval = interval_ms / 1000
+        self.debug = debug
+        self.threshold = threshold_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+
+    def start(self):
+        """Start monitoring the running loop (called from the application lifespan)."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+        if self.debug:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _run(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self._last_tick = now
+            loop_lag.observe(lag)
+            loop_lag_last.set(lag)
+
+    def _watch(self):
+        reported_tick = None
+        while not self._stop.wait(self.threshold / 2):
+            last_tick = self._last_tick
+            stalled = time.monotonic() - last_tick - self.interval
+            if stalled < self.threshold or last_tick == reported_tick:
+                continue
+            # Report each stall once, while the loop is still stuck in it
+            reported_tick = last_tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            location = blocking_location(stack)
+            loop_blocks.inc(location=location)
+            print(
+                f"Event loop blocked for over {stalled * 1000:.0f} ms at {location}:\n"
+                + "".join(traceback.format_list(stack[-15:]))
+            )
+
+
+# Global instance
+loop_monitor = LoopMonitor()
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import re
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional
+
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError
+
+from services.database import mongodb_service
+from services.llm_accounting import generate_content
+from services.metrics import metrics_registry
+from services.vertex import ensure_vertexai
+
+if TYPE_CHECKING:
+    from vertexai.generative_models import GenerativeModel
+
+
+MEMORY_MAX_ITEMS = int(os.getenv("MEMORY_MAX_ITEMS", "12"))
+MEMORY_MAX_CHARS = int(os.getenv("MEMORY_MAX_CHARS", "1500"))
+MEMORY_SUMMARY_MAX_CHARS = int(os.getenv("MEMORY_SUMMARY_MAX_CHARS", "600"))
+# Compact into the summary once more raw memories than this have accumulated
+MEMORY_COMPACT_THRESHOLD = int(os.getenv("MEMORY_COMPACT_THRESHOLD", "8"))
+# Most recent raw memories kept verbatim after compaction
+MEMORY_KEEP_RECENT = int(os.getenv("MEMORY_KEEP_RECENT", "4"))
+# Raw memories beyond the caps wait here for compaction; only dropped if it keeps failing
+MEMORY_BACKLOG_MAX_ITEMS = int(os.getenv("MEMORY_BACKLOG_MAX_ITEMS", "50"))
+MEMORY_COMPACTION_MODEL = os.getenv("MEMORY_COMPACTION_MODEL", "gemini-2.5-flash")
+MAX_WRITE_RETRIES = 3
+
+memory_operations = metrics_registry.counter(
+    "user_memory_operations_total", "User memory store operations by kind"
+)
+
+
+# Words that can differ between two wordings of the same preference
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "be", "to", "of", "in", "on", "for", "with", "and",
+    "or", "that", "this", "it", "they", "their", "them", "user", "really", "very",
+    "also", "when", "by", "as",
+}
+
+
+def _content_tokens(text: str) -> set:
+    return set(re.findall(r"[a-z0-9']+", text.lower())) - STOPWORDS
+
+
+def is_near_duplicate(a: str, b: str) -> bool:
+    """Whether two preference summaries say the same thing.
+
+    Only wordings whose differences are all stopwords count: one changed content word
+    ("short" vs "long videos") is a different preference, however similar the text.
+    """
+    tokens_a, tokens_b = _content_tokens(a), _content_tokens(b)
+    return bool(tokens_a) and tokens_a == tokens_b
+
+
+def merge_memories(memories: List[str], new_memories: List[str]) -> List[str]:
+    """Append new memories, replacing near-duplicates.
+
+    The count and size caps are not applied here: compaction folds the overflow into
+    the summary instead of losing it. Only the backlog bound drops memories.
+    """
+    merged = list(memories)
+    for memory in new_memories:
+        memory = memory.strip()
+        if not memory:
+            continue
+        # The newer wording wins, and moves to the most recent position
+        merged = [m for m in merged if not is_near_duplicate(m, memory)]
+        merged.append(memory)
+
+    while len(merged) > MEMORY_BACKLOG_MAX_ITEMS:
+        merged.pop(0)
+        memory_operations.inc(kind="dropped")
+    return merged
+
+
+def over_caps(memories: List[str]) -> bool:
+    return len(memories) > MEMORY_MAX_ITEMS or sum(len(m) for m in memories) > MEMORY_MAX_CHARS
+
+
+def _most_recent_within_caps(memories: List[str]) -> List[str]:
+    # Raw memories can exceed the caps until compaction folds the overflow into the summary
+    kept, size = [], 0
+    for memory in reversed(memories):
+        if len(kept) >= MEMORY_MAX_ITEMS or size + len(memory) > MEMORY_MAX_CHARS:
+            break
+        kept.append(memory)
+        size += len(memory)
+    return kept[::-1]
+
+
+class UserMemoryStore:
+    """Bounded, deduplicated per-user preference store with background compaction.
+
+    Documents hold a compacted "summary", the most recent raw "memories" and a
+    "version" that is bumped on every change so derived artifacts can be invalidated.
+    """
+
+    def __init__(self):
+        self._model: Optional["GenerativeModel"] = None
+        self._compacting = set()
+        self._tasks = set()
+
+    @property
+    def model(self) -> "GenerativeModel":
+        if self._model is None:
+            from vertexai.generative_models import GenerativeModel
+
+            ensure_vertexai()
+            self._model = GenerativeModel(MEMORY_COMPACTION_MODEL)
+        return self._model
+
+    def _collection(self):
+        return mongodb_service.get_collection("user_memories")
+
+    async def get(self, user_id: str) -> dict:
+        """Return the user's summary, memories and version"""
+        doc = await self._collection().find_one(
+            {"user_id": user_id}, {"summary": 1, "memories": 1, "version": 1}
+        )
+        doc = doc or {}
+        return {
+            "summary": doc.get("summary") or "",
+            "memories": doc.get("memories") or [],
+            "version": doc.get("version", 0),
+        }
+
+    async def get_version(self, user_id: str) -> int:
+        doc = await self._collection().find_one({"user_id": user_id}, {"version": 1})
+        return doc.get("version", 0) if doc else 0
+
+    async def _write(self, user_id: str, expected_version: int, fields: dict) -> bool:
+        """Compare-and-set write keyed on the version read before the change"""
+        version_filter = (
+            {"version": expected_version}
+            if expected_version
+            else {"$or": [{"version": 0}, {"version": {"$exists": False}}]}
+        )
+        try:
+            result = await self._collection().update_one(
+                {"user_id": user_id, **version_filter},
+                {
+                    "$set": {**fields, "version": expected_version + 1, "updated_at": datetime.utcnow()},
+                },
+                upsert=not expected_version,
+            )
+        except DuplicateKeyError:
+            # Another writer created the document first
+            return False
+        return result.matched_count > 0 or result.upserted_id is not None
+
+    async def add(self, user_id: str, summaries: List[str]):
+        """Merge new preference summaries into the user's memories"""
+        for _ in range(MAX_WRITE_RETRIES):
+            current = await self.get(user_id)
+            memories = merge_memories(current["memories"], summaries)
+            if memories == current["memories"]:
+                return
+            if await self._write(user_id, current["version"], {"memories": memories}):
+                memory_operations.inc(len(summaries), kind="added")
+                if len(memories) > MEMORY_COMPACT_THRESHOLD or over_caps(memories):
+                    self.schedule_compaction(user_id)
+                return
+        raise RuntimeError(f"Concurrent updates prevented storing memories for user {user_id}")
+
+    def schedule_compaction(self, user_id: str):
+        """Compact the user's memories in the background, at most once at a time per user"""
+        if user_id in self._compacting:
+            return
+        self._compacting.add(user_id)
+        task = asyncio.create_task(self._run_compaction(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_compaction(self, user_id: str):
+        try:
+            await self.compact(user_id)
+        except Exception as e:
+            print(f"Error compacting memories for user {user_id}: {e}")
+        finally:
+            self._compacting.discard(user_id)
+
+    async def compact(self, user_id: str):
+        """Fold older memories into a concise summary, keeping the most recent ones verbatim.
+
+        Retried from a fresh read when a concurrent write wins the version check.
+        """
+        for _ in range(MAX_WRITE_RETRIES):
+            current = await self.get(user_id)
+            memories = current["memories"]
+            # The kept memories also respect the caps; anything over them is summarised
+            recent = _most_recent_within_caps(memories[-MEMORY_KEEP_RECENT:])
+            older = memories[: len(memories) - len(recent)]
+            if not older:
+                return
+            summary = await self._summarize(current["summary"], older)
+            if await self._write(
+                user_id, current["version"], {"summary": summary, "memories": recent}
+            ):
+                memory_operations.inc(kind="compacted")
+                return
+            memory_operations.inc(kind="compaction_conflict")
+        raise RuntimeError(f"Concurrent updates prevented compacting memories for user {user_id}")
+
+    async def _summarize(self, summary: str, older: List[str]) -> str:
+        existing = summary or "(none)"
+        older_text = "\n".join(f"- {m}" for m in older)
+        prompt = f"""You maintain a concise profile of a student's learning preferences.
+Merge the existing profile with the new preferences below into one short paragraph
+of at most {MEMORY_SUMMARY_MAX_CHARS} characters. Drop duplicates, keep the most recent
+preference when two conflict, and return ONLY the paragraph.
+
+EXISTING PROFILE:
+{existing}
+
+NEW PREFERENCES:
+{older_text}"""
+        response = await asyncio.to_thread(generate_content, self.model, prompt, "memory_compaction")
+        return response.text.strip()[:MEMORY_SUMMARY_MAX_CHARS]
+
+    async def get_prompt_block(self, user_id: str) -> str:
+        """Bounded preference block for prompt injection, or an empty string"""
+        current = await self.get(user_id)
+        if not current["summary"] and not current["memories"]:
+            return ""
+        lines = ["Known User Preferences & Context:"]
+        if current["summary"]:
+            lines.append(current["summary"])
+        lines.extend(f"- {m}" for m in _most_recent_within_caps(current["memories"]))
+        return "\n".join(lines)
+
+
+# Global instance
+user_memory_store = UserMemoryStore()
+
+mongodb_service.register_indexes("user_memories", [IndexModel("user_id", unique=True)])
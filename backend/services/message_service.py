@@ -1,7 +1,9 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from services.database import mongodb_service
-from models.message import MessageCreate, MessageResponse
+from models.message import MessageCreate, MessageResponse, MessagePage
+from services.pagination import encode_cursor, keyset_filter, utc_now_ms
+from services.serialization import from_document, from_documents
 from typing import List, Optional
-from datetime import datetime
 from bson import ObjectId
 
 
@@ -13,15 +15,14 @@ class AsyncMessageService:
 
             # Prepare message document
             message_dict = message_data.dict()
-            message_dict["timestamp"] = datetime.utcnow()
+            message_dict["timestamp"] = utc_now_ms()
 
             result = await collection.insert_one(message_dict)
 
-            # Return created message
-            created_message = await collection.find_one({"_id": result.inserted_id})
-            created_message["_id"] = str(created_message["_id"])
+            # Build the response from what was written instead of reading it back
+            message_dict["_id"] = result.inserted_id
             # conversation_id is already stored as string, no conversion needed
-            return MessageResponse(**created_message)
+            return from_document(MessageResponse, message_dict)
 
         except Exception as e:
             raise Exception(f"Failed to create message: {str(e)}")
@@ -41,17 +42,64 @@ class AsyncMessageService:
                 .limit(limit)
             )
 
-            messages = []
-            async for message_doc in cursor:
-                message_doc["_id"] = str(message_doc["_id"])
-                # conversation_id is already stored as string, no conversion needed
-                messages.append(MessageResponse(**message_doc))
+            # conversation_id is already stored as string, no conversion needed
+            return from_documents(MessageResponse, await cursor.to_list(length=limit))
 
-            return messages
+        except Exception as e:
+            raise Exception(f"Failed to get conversation messages: {str(e)}")
 
+    async def _get_messages_page(
+        self, query: dict, limit: int, cursor: Optional[str], chronological: bool
+    ) -> MessagePage:
+        """Walk (timestamp, _id) newest first from the cursor position"""
+        collection = mongodb_service.get_collection("messages")
+
+        query = {**query, **keyset_filter("timestamp", cursor, descending=True)}
+        docs = (
+            await collection.find(query)
+            .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit + 1)
+            .to_list(length=limit + 1)
+        )
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"])
+
+        if chronological:
+            docs.reverse()
+
+        return MessagePage.model_construct(
+            messages=from_documents(MessageResponse, docs), next_cursor=next_cursor
+        )
+
+    async def get_conversation_messages_page(
+        self, conversation_id: str, limit: int = 50, cursor: Optional[str] = None
+    ) -> MessagePage:
+        """Get the newest messages of a conversation older than the cursor, oldest first within the page"""
+        try:
+            return await self._get_messages_page(
+                {"conversation_id": conversation_id}, limit, cursor, chronological=True
+            )
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to get conversation messages: {str(e)}")
 
+    async def get_user_messages_page(
+        self, user_id: str, limit: int = 50, cursor: Optional[str] = None
+    ) -> MessagePage:
+        """Get a user's messages newest first, continuing from the cursor"""
+        try:
+            return await self._get_messages_page(
+                {"user_id": user_id}, limit, cursor, chronological=False
+            )
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to get user messages: {str(e)}")
+
     async def get_user_messages(
         self, user_id: str, page: int = 1, limit: int = 50
     ) -> List[MessageResponse]:
@@ -67,16 +115,21 @@ class AsyncMessageService:
                 .limit(limit)
             )
 
-            messages = []
-            async for message_doc in cursor:
-                message_doc["_id"] = str(message_doc["_id"])
-                # conversation_id is already stored as string, no conversion needed
-                messages.append(MessageResponse(**message_doc))
-
-            return messages
+            # conversation_id is already stored as string, no conversion needed
+            return from_documents(MessageResponse, await cursor.to_list(length=limit))
 
         except Exception as e:
             raise Exception(f"Failed to get user messages: {str(e)}")
 
 
 message_service = AsyncMessageService()
+
+mongodb_service.register_indexes(
+    "messages",
+    [
+        # get_conversation_messages(_page): filter conversation_id, sort (timestamp, _id)
+        IndexModel([("conversation_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]),
+        # get_user_messages(_page): filter user_id, sort (timestamp, _id) desc
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ],
+)
@@ -0,0 +1,98 @@
+import os
+import threading
+from typing import Dict, Tuple
+
+from pymongo import monitoring
+
+from services.metrics import metrics_registry
+
+
+MONGODB_SLOW_QUERY_MS = float(os.getenv("MONGODB_SLOW_QUERY_MS", "100"))
+# Connection handshakes and heartbeats are not application queries
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+command_duration = metrics_registry.histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and command",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+command_failures = metrics_registry.counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection and command"
+)
+slow_commands = metrics_registry.counter(
+    "mongodb_slow_commands_total", "MongoDB commands slower than MONGODB_SLOW_QUERY_MS"
+)
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    """Collection a command targets, or "-" for database-level commands"""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+
+def command_shape(command_name: str, command: dict) -> str:
+    """Keys of the filter and sort, without values, so slow-query logs never carry user data"""
+    parts = []
+    for field in ("filter", "query", "sort"):
+        value = command.get(field)
+        if isinstance(value, dict):
+            parts.append(f"{field}={sorted(value)}")
+    if command_name == "aggregate":
+        stages = [next(iter(stage), "?") for stage in command.get("pipeline", [])]
+        parts.append(f"pipeline={stages}")
+    return " ".join(parts)
+
+
+class CommandLatencyListener(monitoring.CommandListener):
+    """Records per-collection, per-command latency and logs slow commands.
+
+    Callbacks run on the driver's threads, so they only do dictionary and metric updates.
+    """
+
+    def __init__(self, slow_query_ms: float = MONGODB_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        # (connection, request_id) -> (collection, command)
+        self._in_flight: Dict[Tuple, Tuple[str, dict]] = {}
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = command_collection(event.command_name, event.command)
+        with self._lock:
+            self._in_flight[(event.connection_id, event.request_id)] = (collection, event.command)
+
+    def _finish(self, event):
+        with self._lock:
+            return self._in_flight.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        entry = self._finish(event)
+        if entry is None:
+            return
+        collection, command = entry
+        seconds = event.duration_micros / 1_000_000
+        command_duration.observe(seconds, collection=collection, command=event.command_name)
+
+        if seconds * 1000 >= self.slow_query_ms:
+            slow_commands.inc(collection=collection, command=event.command_name)
+            print(
+                f"Slow MongoDB command: {event.command_name} on {collection} took "
+                f"{seconds * 1000:.1f} ms {command_shape(event.command_name, command)}"
+            )
+
+    def failed(self, event):
+        entry = self._finish(event)
+        if entry is None:
+            return
+        collection, _ = entry
+        command_duration.observe(
+            event.duration_micros / 1_000_000, collection=collection, command=event.command_name
+        )
+        command_failures.inc(collection=collection, command=event.command_name)
+
+
+# Global instance
+command_latency_listener = CommandLatencyListener()
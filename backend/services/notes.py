@@ -1,30 +1,209 @@
-from fpdf import FPDF
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional, Tuple
+from services import rag
 from services.rag import query_video
+from services.feedback_agent import feedback_agent
+from services.structured_output import generate_structured
+from services.tracing import span, timed
+from models.llm import ConceptNotes
 
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'Important Topics & Notes', 0, 1, 'C')
-        self.ln(10)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-async def generate_important_notes_pdf(user_id: str, concepts: list):
-    """Generate a PDF of important notes using extracted concepts and a single RAG call."""
-    
-    pdf = PDF()
-    pdf.add_page()
-    
+# "process" keeps FPDF layout off the event loop and off the GIL; "thread" avoids worker start-up
+NOTES_RENDER_EXECUTOR = os.getenv("NOTES_RENDER_EXECUTOR", "process")
+NOTES_RENDER_WORKERS = int(os.getenv("NOTES_RENDER_WORKERS", "2"))
+NO_CONCEPTS_MESSAGE = "No concepts were extracted. Please load a video first."
+
+# "single" sends every concept in one query_video call, "fanout" retrieves and generates
+# per concept group concurrently, "auto" fans out once there are enough concepts
+NOTES_MODE = os.getenv("NOTES_MODE", "auto")
+NOTES_FANOUT_MIN_CONCEPTS = int(os.getenv("NOTES_FANOUT_MIN_CONCEPTS", "6"))
+NOTES_GROUP_SIZE = int(os.getenv("NOTES_GROUP_SIZE", "3"))
+NOTES_CONCURRENCY = int(os.getenv("NOTES_CONCURRENCY", "4"))
+NOTES_RETRIEVAL_TOP_K = int(os.getenv("NOTES_RETRIEVAL_TOP_K", "3"))
+
+_render_executor: Optional[Executor] = None
+
+
+class NotesGenerationError(Exception):
+    """Notes could not be generated; nothing should be rendered or cached."""
+
+def _get_render_executor() -> Executor:
+    global _render_executor
+    if _render_executor is None:
+        if NOTES_RENDER_EXECUTOR == "thread":
+            _render_executor = ThreadPoolExecutor(
+                max_workers=NOTES_RENDER_WORKERS, thread_name_prefix="notes-render"
+            )
+        else:
+            # spawn avoids forking a process that holds gRPC channels and the event loop
+            _render_executor = ProcessPoolExecutor(
+                max_workers=NOTES_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _render_executor
+
+def shutdown_render_executor():
+    """Stop the PDF render workers (called on application shutdown)."""
+    global _render_executor
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=False, cancel_futures=True)
+        _render_executor = None
+
+@timed("notes.render_pdf")
+async def render_notes_pdf_async(content: str) -> bytes:
+    """Render notes PDF bytes in the bounded render pool without blocking the event loop."""
+    # Imported here so FPDF only loads once notes are actually rendered
+    from services.pdf_renderer import render_notes_pdf
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_render_executor(), render_notes_pdf, content)
+    except BrokenProcessPool:
+        # A crashed worker poisons the pool; replace it for the next request
+        shutdown_render_executor()
+        raise
+
+def use_fanout(concepts: list) -> bool:
+    if NOTES_MODE == "fanout":
+        return True
+    if NOTES_MODE == "single":
+        return False
+    return len(concepts) >= NOTES_FANOUT_MIN_CONCEPTS
+
+def _unavailable_section(concept: str, reason: str) -> dict:
+    return {"title": concept, "timestamp": "00:00:00", "explanation": reason}
+
+def _failed_section(concept: str, error: Exception) -> dict:
+    # Flagged so callers do not cache notes that contain a transient failure
+    return {**_unavailable_section(concept, f"Error generating notes: {str(error)}"), "failed": True}
+
+def _normalize_title(title: str) -> str:
+    return " ".join(re.findall(r"\w+", title.lower()))
+
+def sections_complete(sections: List[dict]) -> bool:
+    """Whether every section was generated, i.e. the notes are safe to cache."""
+    return not any(section.get("failed") for section in sections)
+
+async def _generate_group_sections(
+    corpus_name: str, group: List[str], memories: str
+) -> List[dict]:
+    """Retrieve context for each concept in the group and explain them in one grounded call."""
+    contexts = await asyncio.gather(
+        *(
+            asyncio.to_thread(rag.retrieve_context, corpus_name, concept, NOTES_RETRIEVAL_TOP_K)
+            for concept in group
+        )
+    )
+
+    context_blocks = []
+    for concept, parts in zip(group, contexts):
+        concept_context = "\n\n".join(parts) if parts else "No relevant context found."
+        context_blocks.append(f"CONCEPT: {concept}\nCONTEXT:\n{concept_context}")
+    preferences = f"{memories}\n\n" if memories else ""
+    concepts_json = json.dumps(group)
+    context = "\n\n---\n\n".join(context_blocks)
+
+    prompt = f"""You are a helpful assistant writing study notes for a Youtube video.
+{preferences}For each concept below, explain it in 2-3 sentences based ONLY on its transcript context,
+and give the timestamp (HH:MM:SS) from the context where it is discussed, or "00:00:00" if unknown.
+Return a JSON object with a "notes" array containing exactly one entry per concept, in the same order,
+with the "concept" field set to the concept name exactly as given: {concepts_json}
+
+{context}"""
+
+    with span("notes.generate_group"):
+        result = await asyncio.to_thread(
+            generate_structured, rag.get_model(), prompt, ConceptNotes, "concept_notes"
+        )
+
+    # Matched by title only: falling back to position could attach a neighbour's explanation
+    by_name = {_normalize_title(note.concept): note for note in result.notes}
+    sections = []
+    for concept in group:
+        note = by_name.get(_normalize_title(concept))
+        if note is None:
+            sections.append(_failed_section(concept, Exception("the model returned no section for it")))
+        else:
+            sections.append(
+                {"title": concept, "timestamp": note.timestamp, "explanation": note.explanation}
+            )
+    return sections
+
+async def iter_note_sections(user_id: str, concepts: list) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Generate concept sections concurrently, yielding (concept index, section) as each
+    concept group completes. A failed group yields placeholder sections flagged "failed"
+    instead of failing the notes.
+    """
+    corpus = await asyncio.to_thread(rag.get_or_create_corpus, user_id)
+    memories = await feedback_agent.get_user_memories(user_id)
+    semaphore = asyncio.Semaphore(NOTES_CONCURRENCY)
+
+    async def run_group(start: int, group: List[str]):
+        async with semaphore:
+            try:
+                sections = await _generate_group_sections(corpus.name, group, memories)
+            except Exception as e:
+                print(f"Error generating notes for concepts {group}: {e}")
+                sections = [_failed_section(concept, e) for concept in group]
+        return start, sections
+
+    tasks = [
+        asyncio.create_task(run_group(start, concepts[start : start + NOTES_GROUP_SIZE]))
+        for start in range(0, len(concepts), NOTES_GROUP_SIZE)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            start, sections = await next_done
+            for offset, section in enumerate(sections):
+                yield start + offset, section
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def format_note_sections(sections: List[dict]) -> str:
+    """Format sections in the '### / **Timestamp:** / **Explanation:**' layout the renderer expects."""
+    return "\n\n".join(
+        f"### {section['title']}\n"
+        f"**Timestamp:** {section['timestamp']}\n"
+        f"**Explanation:** {section['explanation']}"
+        for section in sections
+    )
+
+async def render_note_sections_pdf(sections: List[dict]) -> bytes:
+    """Assemble already generated concept sections into the notes PDF."""
+    return await render_notes_pdf_async(format_note_sections(sections))
+
+@timed("notes.generate_content")
+async def generate_notes_content(user_id: str, concepts: list) -> Tuple[str, bool]:
+    """Generate markdown-like notes text for the concepts.
+
+    Returns the text and whether every concept was generated (partial notes must not be
+    cached). Raises NotesGenerationError if the notes could not be generated at all.
+    """
     if not concepts:
-        pdf.set_font("Arial", size=12)
-        pdf.multi_cell(0, 10, "No concepts were extracted. Please load a video first.")
-        # pdf.output returns string in older fpdf
-        out = pdf.output(dest='S')
-        return out.encode('latin-1') if isinstance(out, str) else out
-    
+        return NO_CONCEPTS_MESSAGE, True
+
+    if use_fanout(concepts):
+        try:
+            sections = [None] * len(concepts)
+            async for index, section in iter_note_sections(user_id, concepts):
+                sections[index] = section
+        except Exception as e:
+            raise NotesGenerationError(f"Failed to generate notes: {str(e)}")
+        return format_note_sections(sections), sections_complete(sections)
+
+    return await _generate_single_notes_content(user_id, concepts), True
+
+@timed("notes.generate_single")
+async def _generate_single_notes_content(user_id: str, concepts: list) -> str:
+    """Generate notes for all concepts with a single RAG call."""
     # Build a single query with all concepts
     concepts_list = ", ".join(concepts)
     query = (
@@ -35,7 +214,7 @@ async def generate_important_notes_pdf(user_id: str, concepts: list):
         f"IMPORTANT: Return ONLY the formatted text. DO NOT wrap the output in JSON or code blocks.\n\n"
         f"Concepts: {concepts_list}"
     )
-    
+
     try:
         result = await query_video(query, user_id)
         
@@ -74,48 +253,25 @@ async def generate_important_notes_pdf(user_id: str, concepts: list):
         content = content.replace('```json', '').replace('```', '').strip()
         
     except Exception as e:
-        content = f"Error generating notes: {str(e)}"
-    
-    safe_content = content.encode('latin-1', 'replace').decode('latin-1')
-    
-    # Simple Markdown-like rendering
-    lines = safe_content.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            pdf.ln(5)
-            continue
-            
-        if line.startswith('###'):
-            # Header
-            header_text = line.replace('###', '').strip()
-            pdf.set_font("Arial", 'B', 14)
-            pdf.cell(0, 10, header_text, 0, 1)
-            pdf.set_font("Arial", size=12)
-        elif '**' in line:
-            # Handle simple bolding e.g. **Timestamp:** 00:01:00
-            parts = line.split('**')
-            pdf.set_font("Arial", size=12)
-            is_bold = False
-            for part in parts:
-                if not part:
-                    is_bold = not is_bold
-                    continue
-                
-                if is_bold:
-                    pdf.set_font("Arial", 'B', 12)
-                    pdf.write(8, part)
-                    pdf.set_font("Arial", '', 12)
-                else:
-                    pdf.write(8, part)
-                is_bold = not is_bold
-            pdf.ln(8)
-        else:
-            # Normal text
-            pdf.set_font("Arial", size=12)
-            pdf.multi_cell(0, 8, line)
-            pdf.ln(2)
-    
-    out = pdf.output(dest='S')
-    return out.encode('latin-1') if isinstance(out, str) else out
+        raise NotesGenerationError(f"Failed to generate notes: {str(e)}")
+
+    return content
+
+async def generate_important_notes_pdf(
+    user_id: str, concepts: list, timings: Optional[dict] = None
+) -> Tuple[bytes, bool]:
+    """Generate a PDF of important notes using extracted concepts.
+
+    Returns the PDF and whether it is complete. If a timings dict is passed, generation
+    and render durations (ms) are recorded in it.
+    """
+    start = time.perf_counter()
+    content, complete = await generate_notes_content(user_id, concepts)
+    generated = time.perf_counter()
+    pdf_bytes = await render_notes_pdf_async(content)
+    rendered = time.perf_counter()
 
+    if timings is not None:
+        timings["generate"] = (generated - start) * 1000
+        timings["render"] = (rendered - generated) * 1000
+    return pdf_bytes, complete
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import List, Optional
+
+from services.metrics import metrics_registry
+
+
+NOTES_CACHE_DIR = os.getenv(
+    "NOTES_CACHE_DIR", os.path.join(tempfile.gettempdir(), "notes_pdf_cache")
+)
+NOTES_CACHE_MAX_BYTES = int(os.getenv("NOTES_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+# Browsers must revalidate with If-None-Match, which is answered with a cheap 304
+NOTES_CACHE_MAX_AGE = int(os.getenv("NOTES_CACHE_MAX_AGE", "0"))
+# Bump when the notes prompt or PDF layout changes so stale renders are not served
+NOTES_FORMAT_VERSION = 2
+
+notes_cache_requests = metrics_registry.counter(
+    "notes_pdf_cache_requests_total", "Notes PDF cache lookups by result"
+)
+
+
+def notes_cache_key(conversation_id: str, concepts: List[str], memory_version: int) -> str:
+    """Hash everything the rendered notes depend on into a stable cache key / ETag."""
+    payload = json.dumps(
+        [NOTES_FORMAT_VERSION, conversation_id, concepts, memory_version],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(
+        tag.removeprefix("W/") == etag for tag in candidates
+    )
+
+
+def cache_control_header() -> str:
+    return f"private, max-age={NOTES_CACHE_MAX_AGE}, must-revalidate"
+
+
+class NotesPDFCache:
+    """Bounded on-disk store of rendered notes PDFs, evicting least recently used files."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached PDF and refresh its recency, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            notes_cache_requests.inc(result="miss")
+            return None
+        notes_cache_requests.inc(result="hit")
+        return content
+
+    def put(self, key: str, content: bytes):
+        """Store a rendered PDF atomically and enforce the size budget"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".pdf"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+
+# Global instance
+notes_pdf_cache = NotesPDFCache(NOTES_CACHE_DIR, NOTES_CACHE_MAX_BYTES)
@@ -0,0 +1,63 @@
+from fpdf import FPDF
+
+# Kept free of service imports so process pool workers stay cheap to start
+
+class PDF(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, 'Important Topics & Notes', 0, 1, 'C')
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+def render_notes_pdf(content: str) -> bytes:
+    """Render markdown-like notes text into PDF bytes."""
+    pdf = PDF()
+    pdf.add_page()
+
+    safe_content = content.encode('latin-1', 'replace').decode('latin-1')
+    
+    # Simple Markdown-like rendering
+    lines = safe_content.split('\n')
+    for line in lines:
+        line = line.strip()
+        if not line:
+            pdf.ln(5)
+            continue
+            
+        if line.startswith('###'):
+            # Header
+            header_text = line.replace('###', '').strip()
+            pdf.set_font("Arial", 'B', 14)
+            pdf.cell(0, 10, header_text, 0, 1)
+            pdf.set_font("Arial", size=12)
+        elif '**' in line:
+            # Handle simple bolding e.g. **Timestamp:** 00:01:00
+            parts = line.split('**')
+            pdf.set_font("Arial", size=12)
+            is_bold = False
+            for part in parts:
+                if not part:
+                    is_bold = not is_bold
+                    continue
+                
+                if is_bold:
+                    pdf.set_font("Arial", 'B', 12)
+                    pdf.write(8, part)
+                    pdf.set_font("Arial", '', 12)
+                else:
+                    pdf.write(8, part)
+                is_bold = not is_bold
+            pdf.ln(8)
+        else:
+            # Normal text
+            pdf.set_font("Arial", size=12)
+            pdf.multi_cell(0, 8, line)
+            pdf.ln(2)
+    
+    # pdf.output returns string in older fpdf
+    out = pdf.output(dest='S')
+    return out.encode('latin-1') if isinstance(out, str) else out
@@ -0,0 +1,132 @@
+import cProfile
+import hmac
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+
+# Profiling is only wired into the app when a token is configured
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "request_profiles"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_MODE_HEADER = b"x-profile-mode"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's stack on a background thread into collapsed (folded) stacks.
+
+    The output is the "frame;frame;frame count" format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling single requests that carry the admin profile token.
+
+    "sample" mode (default) writes collapsed stacks of the event loop thread to a .folded
+    file for flame graphs; "cprofile" mode writes a .prof file for pstats / snakeviz.
+    Both observe the whole event loop, so concurrent requests show up in the profile too.
+    The response carries an x-profile-id header naming the file in PROFILE_DIR.
+    """
+
+    def __init__(self, app, token: str, directory: str = PROFILE_DIR):
+        self.app = app
+        self.token = token.encode()
+        self.directory = directory
+        # One profile at a time: cProfile cannot nest and overlapping samples are unreadable
+        self._active = False
+
+    def _profile_mode(self, scope: Dict) -> Optional[str]:
+        headers = dict(scope.get("headers") or [])
+        supplied = headers.get(PROFILE_TOKEN_HEADER)
+        if not supplied or not hmac.compare_digest(supplied, self.token):
+            return None
+        mode = headers.get(PROFILE_MODE_HEADER, b"sample").decode()
+        return mode if mode in ("sample", "cprofile") else "sample"
+
+    def _profile_name(self, scope: Dict, mode: str) -> str:
+        path = re.sub(r"[^A-Za-z0-9]+", "_", scope.get("path", "")).strip("_") or "root"
+        extension = "folded" if mode == "sample" else "prof"
+        return f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{scope.get('method', 'GET')}_{path[:80]}.{extension}"
+
+    async def __call__(self, scope: Dict, receive, send):
+        mode = self._profile_mode(scope) if scope["type"] == "http" else None
+        if mode is None or self._active:
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        name = self._profile_name(scope, mode)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER, name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+            profiler.start()
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if mode == "cprofile":
+                profiler.disable()
+            else:
+                profiler.stop()
+            self._active = False
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, name)
+            if mode == "cprofile":
+                profiler.dump_stats(path)
+            else:
+                profiler.write(path)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"Profiled {scope.get('method')} {scope.get('path')} in {elapsed_ms:.0f} ms: {path}")
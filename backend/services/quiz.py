@@ -1,44 +1,50 @@
-import json
-from typing import List, Dict
+import time
+from typing import List, Dict, Iterator
+from pydantic import ValidationError
 from services import rag
-
-def generate_quiz(user_id: str) -> List[Dict]:
+from services.json_stream import iter_json_array_items
+from services.llm_accounting import generate_content
+from services.structured_output import generation_config, structured_output_failures
+from services.tracing import record, span, timed
+from models.llm import Quiz, QuizQuestion
+
+@timed("quiz.build_prompt")
+def build_quiz_prompt(user_id: str) -> str:
     """
-    Generates a quiz based on the content in the vector store for a specific user.
-    Returns a list of dictionaries, where each dictionary represents a question.
+    Builds the quiz prompt from the content in the vector store for a specific user.
+    Raises ValueError if the user has no video loaded.
     """
-    try:
-        # Get all documents for the specific user from the in-memory store
-        documents = rag.get_current_docs(user_id)
-
-        if not documents:
-            raise ValueError("No video loaded. Please load a video first.")
-
-        # Construct context from documents
-        context_parts = []
-        for doc in documents:
-            # Document object from LangChain should have metadata with timestamp
-            timestamp = doc.metadata.get("start_timestamp", "00:00:00")
-            # Format timestamp nicely if possible, but raw seconds is okay if LLM understands
-            # Let's try to convert to HH:MM:SS for better context understanding
-            try:
-                ts = int(timestamp)
-                h = ts // 3600
-                m = (ts % 3600) // 60
-                s = ts % 60
-                ts_str = f"{h:02d}:{m:02d}:{s:02d}"
-            except:
-                ts_str = str(timestamp)
-                
-            context_parts.append(f"[Timestamp: {ts_str}]\n{doc.page_content}")
-        
-        # Limit context size if necessary, but for now we'll try to use a good chunk of it
-        # Since we want to cover the whole video, we pass as much as possible fitting in context.
-        # If it's too large, we might need a strategy (summarization or sampling), 
-        # but let's assume it fits for hackathon scale.
-        full_context = "\n\n".join(context_parts)
-        
-        prompt = f"""You are a helpful education assistant.
+    # Get all documents for the specific user from the in-memory store
+    documents = rag.get_current_docs(user_id)
+
+    if not documents:
+        raise ValueError("No video loaded. Please load a video first.")
+
+    # Construct context from documents
+    context_parts = []
+    for doc in documents:
+        # Document object from LangChain should have metadata with timestamp
+        timestamp = doc.metadata.get("start_timestamp", "00:00:00")
+        # Format timestamp nicely if possible, but raw seconds is okay if LLM understands
+        # Let's try to convert to HH:MM:SS for better context understanding
+        try:
+            ts = int(timestamp)
+            h = ts // 3600
+            m = (ts % 3600) // 60
+            s = ts % 60
+            ts_str = f"{h:02d}:{m:02d}:{s:02d}"
+        except:
+            ts_str = str(timestamp)
+
+        context_parts.append(f"[Timestamp: {ts_str}]\n{doc.page_content}")
+
+    # Limit context size if necessary, but for now we'll try to use a good chunk of it
+    # Since we want to cover the whole video, we pass as much as possible fitting in context.
+    # If it's too large, we might need a strategy (summarization or sampling),
+    # but let's assume it fits for hackathon scale.
+    full_context = "\n\n".join(context_parts)
+
+    return f"""You are a helpful education assistant.
 Your task is to generate a quiz based on the provided video transcript segments.
 Create 5 to 10 multiple-choice questions that test the user's understanding of the key concepts.
 
@@ -46,42 +52,74 @@ TRANSCRIPT:
 {full_context}
 
 INSTRUCTIONS:
-Return the output strictly as a JSON array of objects. Each object must have the following fields:
+Return the output as a JSON object with a "questions" array. Each question object must have the following fields:
 - "question": The question string.
 - "options": An array of 4 string options.
 - "correct_option": The string text of the correct option (must be one of the options).
 - "timestamp": The timestamp string (HH:MM:SS) where this topic is discussed.
+"""
 
-Do not include any markdown formatting (like ```json), just the raw JSON string.
+def build_remedial_quiz_prompt(mistakes: List[Dict]) -> str:
+    """Builds the remedial quiz prompt from the user's mistakes."""
+    mistakes_context = "\n".join([f"- Question: {m.get('question')}\n  Correct Answer: {m.get('correct_option')}" for m in mistakes])
+
+    return f"""You are a helpful education assistant.
+Your task is to generate a REMEDIAL quiz based on the concepts related to the user's mistakes.
+The user struggled with the following questions. Identify the underlying concepts and create 5 NEW multiple-choice questions to test these specific concepts again.
+
+MISTAKES:
+{mistakes_context}
+
+INSTRUCTIONS:
+Return the output as a JSON object with a "questions" array. Each question object must have the following fields:
+- "question": The question string.
+- "options": An array of 4 string options.
+- "correct_option": The string text of the correct option (must be one of the options).
+- "timestamp": The timestamp string (HH:MM:SS) where this topic is discussed (infer or use '00:00:00' if unknown).
 """
 
-        response = rag.model.generate_content(prompt)
-        content = response.text.strip()
-        
-        # Clean up code blocks if present (the model might add them despite instructions)
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        quiz_data = json.loads(content)
-        
-        # Handle case where LLM wraps the list in a dict (e.g., {"questions": [...]})
-        if isinstance(quiz_data, dict):
-            if "questions" in quiz_data and isinstance(quiz_data["questions"], list):
-                quiz_data = quiz_data["questions"]
-            elif "quiz" in quiz_data and isinstance(quiz_data["quiz"], list):
-                quiz_data = quiz_data["quiz"]
-            else:
-                 # Attempt to find any list in values
-                 for val in quiz_data.values():
-                     if isinstance(val, list):
-                         quiz_data = val
-                         break
-        
-        if not isinstance(quiz_data, list):
+def _stream_model_text(prompt: str, operation: str) -> Iterator[str]:
+    """Yield the text of each streamed model chunk."""
+    for chunk in generate_content(
+        rag.get_model(), prompt, operation, generation_config=generation_config(Quiz), stream=True
+    ):
+        try:
+            text = chunk.text
+        except Exception:
+            # Chunks carrying only finish/safety metadata have no text part
+            continue
+        if text:
+            yield text
+
+def stream_questions(prompt: str, name: str = "quiz") -> Iterator[Dict]:
+    """
+    Streams quiz questions from the model, yielding each question as soon as it is complete.
+    Code fences and wrapper objects (e.g. {"questions": [...]}) are tolerated and
+    questions that fail schema validation are skipped instead of failing the whole quiz.
+    """
+    start = time.perf_counter()
+    first = True
+    for item in iter_json_array_items(_stream_model_text(prompt, name), name):
+        if first:
+            # Measured here rather than with a span so the consumer's time is not included
+            record(f"{name}.first_question", time.perf_counter() - start)
+            first = False
+        try:
+            yield QuizQuestion.model_validate(item).model_dump()
+        except ValidationError:
+            structured_output_failures.inc(schema=name, stage="item")
+
+def generate_quiz(user_id: str) -> List[Dict]:
+    """
+    Generates a quiz based on the content in the vector store for a specific user.
+    Returns a list of dictionaries, where each dictionary represents a question.
+    """
+    try:
+        prompt = build_quiz_prompt(user_id)
+        with span("quiz.generate"):
+            quiz_data = list(stream_questions(prompt, "quiz"))
+
+        if not quiz_data:
             raise ValueError("Model output is not a list of questions")
 
         return quiz_data
@@ -98,51 +136,11 @@ def generate_remedial_quiz(mistakes: List[Dict], user_id: str) -> List[Dict]:
     try:
         if not mistakes:
             return generate_quiz(user_id) # Fallback to generic quiz if no mistakes provided
-            
-        mistakes_context = "\n".join([f"- Question: {m.get('question')}\n  Correct Answer: {m.get('correct_option')}" for m in mistakes])
-
-        prompt = f"""You are a helpful education assistant.
-Your task is to generate a REMEDIAL quiz based on the concepts related to the user's mistakes.
-The user struggled with the following questions. Identify the underlying concepts and create 5 NEW multiple-choice questions to test these specific concepts again.
 
-MISTAKES:
-{mistakes_context}
-
-INSTRUCTIONS:
-Return the output strictly as a JSON array of objects. Each object must have the following fields:
-- "question": The question string.
-- "options": An array of 4 string options.
-- "correct_option": The string text of the correct option (must be one of the options).
-- "timestamp": The timestamp string (HH:MM:SS) where this topic is discussed (infer or use '00:00:00' if unknown).
-
-Do not include any markdown formatting just the raw JSON string.
-"""
+        with span("remedial_quiz.generate"):
+            quiz_data = list(stream_questions(build_remedial_quiz_prompt(mistakes), "remedial_quiz"))
 
-        response = rag.model.generate_content(prompt)
-        content = response.text.strip()
-        
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        quiz_data = json.loads(content)
-        
-        # Handle case where LLM wraps the list in a dict
-        if isinstance(quiz_data, dict):
-            if "questions" in quiz_data and isinstance(quiz_data["questions"], list):
-                quiz_data = quiz_data["questions"]
-            elif "quiz" in quiz_data and isinstance(quiz_data["quiz"], list):
-                quiz_data = quiz_data["quiz"]
-            else:
-                 for val in quiz_data.values():
-                     if isinstance(val, list):
-                         quiz_data = val
-                         break
-
-        if not isinstance(quiz_data, list):
+        if not quiz_data:
              raise ValueError("Model output is not a list of questions")
 
         return quiz_data
@@ -1,90 +1,173 @@
 import json
 import os
-import vertexai
-from vertexai.preview import rag
-from vertexai.generative_models import GenerativeModel, Tool, SafetySetting
-from langchain_community.document_loaders import YoutubeLoader
-from langchain_community.document_loaders.youtube import TranscriptFormat
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from dotenv import load_dotenv
+import sys
+import threading
 from typing import Optional, List
+from services import vertex
+from services.vertex import PROJECT_ID
 from services.feedback_agent import feedback_agent
+from services.cache import LRUCache
+from services.structured_output import generate_structured, StructuredOutputError
+from services.tracing import span, timed
+from models.llm import ConceptList, QueryAnswer
 
-load_dotenv()
+MODEL_NAME = "gemini-2.5-flash"
+BATCH_SIZE = 10
+# Load the providers during startup instead of on the first request that needs them
+WARM_UP_PROVIDERS = os.getenv("WARM_UP_PROVIDERS", "false").lower() == "true"
 
-# Initialize Vertex AI
-PROJECT_ID = os.getenv("GCP_PROJECT_ID")
-# RAG is in us-west1, but models might be better supported in us-central1
-LOCATION = "us-west1"
-MODEL_LOCATION = "us-central1"
+# Vertex AI, its RAG API and the LangChain loaders are heavy imports, so they are
+# loaded on first use through the accessors below to keep cold start fast
+_model = None
+_rag_api = None
+_providers_lock = threading.Lock()
 
-if PROJECT_ID:
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-else:
-    print("Warning: GCP_PROJECT_ID not set. Vertex AI functionality will fail.")
 
-# Global variables
-model = GenerativeModel("gemini-2.5-flash")
-BATCH_SIZE = 10
+def get_model():
+    """Shared Gemini model, created on first use."""
+    global _model
+    if _model is None:
+        with _providers_lock:
+            if _model is None:
+                vertex.ensure_vertexai()
+                from vertexai.generative_models import GenerativeModel
+
+                _model = GenerativeModel(MODEL_NAME)
+    return _model
+
+
+def get_rag_api():
+    """The vertexai.preview.rag module, imported on first use."""
+    global _rag_api
+    if _rag_api is None:
+        vertex.ensure_vertexai()
+        from vertexai.preview import rag
+
+        _rag_api = rag
+    return _rag_api
+
+
+def get_youtube_loader():
+    """LangChain's YoutubeLoader class and its chunked transcript format, imported on first use."""
+    from langchain_community.document_loaders import YoutubeLoader
+    from langchain_community.document_loaders.youtube import TranscriptFormat
+
+    return YoutubeLoader, TranscriptFormat.CHUNKS
+
+
+def warm_up_providers():
+    """Import and initialise the lazy providers ahead of the first request."""
+    get_model()
+    get_rag_api()
+    get_youtube_loader()
+    feedback_agent.warm_up()
+    import services.pdf_renderer  # noqa: F401
+
 
 # Per-user in-memory state (Fallbacks for when DB isn't enough or for speed)
 # Ideally, transcripts are in Vertex RAG and concepts are in MongoDB.
-user_docs = {} # user_id -> List[Document]
+USER_DOCS_MAX_BYTES = int(os.getenv("USER_DOCS_MAX_BYTES", str(256 * 1024 * 1024)))
+USER_DOCS_MAX_ENTRIES = int(os.getenv("USER_DOCS_MAX_ENTRIES", "1000"))
+USER_DOCS_TTL_SECONDS = float(os.getenv("USER_DOCS_TTL_SECONDS", "3600"))
+# Rough per-Document overhead (object, metadata dict) on top of the transcript text
+DOC_OVERHEAD_BYTES = 512
+
+
+def estimate_docs_size(documents: list) -> int:
+    """Estimate the in-memory footprint of a list of transcript Documents."""
+    return sum(sys.getsizeof(doc.page_content) + DOC_OVERHEAD_BYTES for doc in documents)
+
+
+user_docs = LRUCache(  # user_id -> List[Document]
+    "user_docs",
+    max_entries=USER_DOCS_MAX_ENTRIES,
+    max_bytes=USER_DOCS_MAX_BYTES,
+    ttl_seconds=USER_DOCS_TTL_SECONDS,
+    sizeof=estimate_docs_size,
+)
+# The last video each user loaded, so evicted transcripts can be reloaded on demand
+user_video_urls = LRUCache("user_video_urls", max_entries=USER_DOCS_MAX_ENTRIES * 10)
 
+@timed("rag.get_or_create_corpus")
 def get_or_create_corpus(user_id: str):
     """Get existing corpus for user or create a new one."""
     display_name = f"user-{user_id}"
     try:
-        corpora = rag.list_corpora()
+        corpora = get_rag_api().list_corpora()
         for corpus in corpora:
             if corpus.display_name == display_name:
                 return corpus
     except Exception as e:
         print(f"Error listing corpora: {e}")
-    return rag.create_corpus(display_name=display_name)
+    return get_rag_api().create_corpus(display_name=display_name)
 
+@timed("rag.purge_corpus_files")
 def purge_corpus_files(corpus_name: str):
     """Delete all files in the specified corpus."""
     try:
-        files = list(rag.list_files(corpus_name=corpus_name))
+        files = list(get_rag_api().list_files(corpus_name=corpus_name))
         for file in files:
-            rag.delete_file(name=file.name)
+            get_rag_api().delete_file(name=file.name)
     except Exception as e:
         print(f"Error purging corpus files: {e}")
 
+@timed("rag.extract_concepts")
 def extract_concepts_batch(combined_text: str) -> list:
     """Extract concepts from a combined text block using the LLM."""
     try:
         prompt = f"""You are a helpful assistant. Extract the main concepts or topics discussed in the following text. 
-Return a JSON array of concept strings (max 5-10 words each). 
-Return ONLY the JSON array, no other text.
+Return a JSON object with a "concepts" array of concept strings (max 5-10 words each). 
 
 Text:
 {combined_text}
 """
-        response = model.generate_content(prompt)
-        content = response.text.strip()
-        if content.startswith("```json"): content = content[7:]
-        if content.startswith("```"): content = content[3:]
-        if content.endswith("```"): content = content[:-3]
-        concepts = json.loads(content)
-        return concepts if isinstance(concepts, list) else []
+        result = generate_structured(get_model(), prompt, ConceptList, "concepts")
+        return result.concepts
     except Exception as e:
         print(f"Error extracting concepts: {e}")
         return []
 
 def clear_vector_store(user_id: Optional[str] = None):
     """Clear state for a specific user or all users if user_id is None."""
-    global user_docs
     if user_id:
-        if user_id in user_docs:
-            del user_docs[user_id]
+        user_docs.pop(user_id)
+        user_video_urls.pop(user_id)
     else:
-        user_docs = {}
+        user_docs.clear()
+        user_video_urls.clear()
+
+@timed("rag.load_transcript")
+def load_transcript(url: str) -> list:
+    """Load the 30 second transcript chunks of a YouTube video."""
+    loader_class, chunks_format = get_youtube_loader()
+    loader = loader_class.from_youtube_url(
+        url,
+        add_video_info=False,
+        transcript_format=chunks_format,
+        chunk_size_seconds=30,
+    )
+    return loader.load()
 
 def get_current_docs(user_id: str) -> list:
-    """Get the current documents for a user."""
-    return user_docs.get(user_id, [])
+    """Get the current documents for a user, reloading them if they were evicted.
+
+    The reload fetches the transcript from YouTube and blocks, so call from a thread.
+    """
+    documents = user_docs.get(user_id)
+    if documents is not None:
+        return documents
+
+    url = user_video_urls.get(user_id)
+    if not url:
+        return []
+    try:
+        documents = load_transcript(url)
+    except Exception as e:
+        print(f"Error reloading transcript for user {user_id}: {e}")
+        return []
+    if documents:
+        user_docs.set(user_id, documents)
+    return documents
 
 def load_youtube_video_stream(url: str, user_id: str):
     """Load YouTube video transcript, process, and upload to Vertex RAG yielding progress."""
@@ -111,13 +194,7 @@ def load_youtube_video_stream(url: str, user_id: str):
         # Load Transcript
         yield json.dumps({"status": "progress", "message": "Loading transcript...", "progress": 10}) + "\n"
         try:
-            loader = YoutubeLoader.from_youtube_url(
-                url,
-                add_video_info=False,
-                transcript_format=TranscriptFormat.CHUNKS,
-                chunk_size_seconds=30,
-            )
-            documents = loader.load()
+            documents = load_transcript(url)
         except Exception as e:
              yield json.dumps({"status": "error", "message": f"Failed to load video: {str(e)}"}) + "\n"
              return
@@ -127,31 +204,33 @@ def load_youtube_video_stream(url: str, user_id: str):
             return
         
         # Update user_docs for quiz.py
-        user_docs[user_id] = documents
+        user_docs.set(user_id, documents)
+        user_video_urls.set(user_id, url)
 
         # Format transcript with timestamps for RAG
         yield json.dumps({"status": "progress", "message": "Processing transcript...", "progress": 20}) + "\n"
-        formatted_transcript = ""
-        for doc in documents:
-            raw_ts = doc.metadata.get('start_timestamp', 0)
-            ts_str = "00:00:00"
-            
-            try:
-                # If it's already a formatted string like HH:MM:SS
-                if isinstance(raw_ts, str) and ":" in raw_ts:
-                    ts_str = raw_ts
-                else:
-                    # Treat as seconds (int or float)
-                    timestamp = int(float(raw_ts))
-                    h = timestamp // 3600
-                    m = (timestamp % 3600) // 60
-                    s = timestamp % 60
-                    ts_str = f"{h:02d}:{m:02d}:{s:02d}"
-            except Exception:
-                # Fallback
+        with span("rag.format_transcript"):
+            formatted_transcript = ""
+            for doc in documents:
+                raw_ts = doc.metadata.get('start_timestamp', 0)
                 ts_str = "00:00:00"
+            
+                try:
+                    # If it's already a formatted string like HH:MM:SS
+                    if isinstance(raw_ts, str) and ":" in raw_ts:
+                        ts_str = raw_ts
+                    else:
+                        # Treat as seconds (int or float)
+                        timestamp = int(float(raw_ts))
+                        h = timestamp // 3600
+                        m = (timestamp % 3600) // 60
+                        s = timestamp % 60
+                        ts_str = f"{h:02d}:{m:02d}:{s:02d}"
+                except Exception:
+                    # Fallback
+                    ts_str = "00:00:00"
 
-            formatted_transcript += f"[{ts_str}] {doc.page_content}\n\n"
+                formatted_transcript += f"[{ts_str}] {doc.page_content}\n\n"
         
         # Save to temp file
         temp_file_path = f"temp_transcript_{user_id}.txt"
@@ -187,12 +266,13 @@ def load_youtube_video_stream(url: str, user_id: str):
         
         try:
             # Using upload_file for local files
-            rag.upload_file(
-                corpus_name=corpus.name,
-                path=temp_file_path,
-                display_name=f"transcript_{user_id}",
-                description="Youtube Video Transcript"
-            )
+            with span("rag.upload_file"):
+                get_rag_api().upload_file(
+                    corpus_name=corpus.name,
+                    path=temp_file_path,
+                    display_name=f"transcript_{user_id}",
+                    description="Youtube Video Transcript"
+                )
             
             # Clean up temp file
             if os.path.exists(temp_file_path):
@@ -214,6 +294,19 @@ def load_youtube_video_stream(url: str, user_id: str):
     except Exception as e:
         yield json.dumps({"status": "error", "message": f"Unexpected error: {str(e)}"}) + "\n"
 
+@timed("rag.retrieve_context")
+def retrieve_context(corpus_name: str, text: str, top_k: int = 5) -> List[str]:
+    """Retrieve the text of the chunks most relevant to the text from a corpus."""
+    rag = get_rag_api()
+    retrieval_response = rag.retrieval_query(
+        rag_resources=[rag.RagResource(rag_corpus=corpus_name)],
+        text=text,
+        similarity_top_k=top_k,
+        vector_distance_threshold=0.65
+    )
+    return [ctx.text for ctx in retrieval_response.contexts.contexts]
+
+@timed("rag.query_video")
 async def query_video(query: str, user_id: str) -> dict:
     """Process a query using Vertex RAG with explicit context injection."""
     if not query:
@@ -223,24 +316,12 @@ async def query_video(query: str, user_id: str) -> dict:
         corpus = get_or_create_corpus(user_id)
         
         # Explicitly retrieve content from the corpus
-        retrieval_response = rag.retrieval_query(
-            rag_resources=[rag.RagResource(rag_corpus=corpus.name)],
-            text=query,
-            similarity_top_k=5,
-            vector_distance_threshold=0.65
-        )
-        
-        # Build context from retrieved chunks
-        context_parts = []
-        for ctx in retrieval_response.contexts.contexts:
-            context_parts.append(ctx.text)
+        context_parts = retrieve_context(corpus.name, query)
         
         context = "\n\n---\n\n".join(context_parts) if context_parts else "No relevant context found."
-        
-        # Ensure we are initialized in a region that supports the model
-        # Try to re-init if us-west1 failed for generative models previously
-        vertexai.init(project=PROJECT_ID, location=MODEL_LOCATION)
-        
+
+        model = get_model()
+
         # Get user memories for personalization
         memories = await feedback_agent.get_user_memories(user_id)
         if memories:
@@ -249,11 +330,7 @@ async def query_video(query: str, user_id: str) -> dict:
         # Generate answer using the retrieved context
         prompt = f"""You are a helpful assistant. Answer the user's question based ONLY on the provided context (Youtube Video Transcript).
 If the answer is in the context, provide the timestamp from the context in the format HH:MM:SS.
-Return your answer in the following JSON format:
-{{
-  "answer": "string",
-  "timestamp": "HH:MM:SS"
-}}
+Return your answer as a JSON object with an "answer" string and a "timestamp" string (HH:MM:SS).
 If the context doesn't contain the answer, say so and set timestamp to "00:00:00".
 
 CONTEXT:
@@ -261,46 +338,14 @@ CONTEXT:
 
 USER QUESTION: {query}"""
 
-        response = model.generate_content(prompt)
-        
-        # Re-init back to RAG location just in case
-        vertexai.init(project=PROJECT_ID, location=LOCATION)
-        
-        # Parse response
-        text = response.text.strip()
         try:
-            # Clean markdown JSON block if present
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0].strip()
-            
-            # Simple JSON parse
-            try:
-                res_json = json.loads(text)
-                return res_json
-            except json.JSONDecodeError:
-                # If JSON parse fails, try to find "answer": "..." using regex
-                import re
-                # This regex looks for the content inside "answer": "..." even if JSON is malformed/truncated
-                answer_match = re.search(r'"answer":\s*"(.*?)"(?:\s*,|\s*})', text, re.DOTALL)
-                if answer_match:
-                    ans = answer_match.group(1).encode().decode('unicode_escape')
-                    return {"answer": ans, "timestamp": "00:00:00"}
-                
-                # If that fails, maybe the LLM just returned the text directly despite the JSON request
-                if "###" in text or "**Timestamp:**" in text:
-                    return {"answer": text, "timestamp": "00:00:00"}
-                
-                raise # Go to fallback
-                
-        except Exception:
-            # Fallback if all extraction fails
-            return {
-                "answer": response.text,
-                "timestamp": "00:00:00"
-            }
-            
+            with span("rag.generate_answer"):
+                result = generate_structured(model, prompt, QueryAnswer, "query_answer")
+            return result.model_dump()
+        except StructuredOutputError as e:
+            # Fallback if the output could not be validated even after repair
+            return {"answer": e.raw_text, "timestamp": "00:00:00"}
+
     except Exception as e:
         raise Exception(f"Query failed: {str(e)}")
 
@@ -308,7 +353,7 @@ def debug_corpus_state(user_id: str) -> dict:
     """Return the files currently in the user's corpus."""
     try:
         corpus = get_or_create_corpus(user_id)
-        files = list(rag.list_files(corpus_name=corpus.name))
+        files = list(get_rag_api().list_files(corpus_name=corpus.name))
         return {
             "corpus_name": corpus.name,
             "display_name": corpus.display_name,
@@ -325,6 +370,7 @@ def debug_retrieve_content(user_id: str, query: str) -> dict:
         corpus = get_or_create_corpus(user_id)
         
         # Use the rag.retrieval_query to get the raw chunks
+        rag = get_rag_api()
         response = rag.retrieval_query(
             rag_resources=[rag.RagResource(rag_corpus=corpus.name)],
             text=query,
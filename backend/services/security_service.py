@@ -1,17 +1,15 @@
 import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
-import requests
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
 from jose import JWTError, jwt
 from pydantic import BaseModel
 
 from models.user import TokenData, User
 from services.user_service import user_service
+from services.google_auth import GoogleTokenVerifier
 
 # --- Constants ---
 # Make sure to set these in your environment variables
@@ -22,6 +20,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/google")
 
+google_token_verifier = GoogleTokenVerifier(GOOGLE_CLIENT_ID)
+
 
 class GoogleToken(BaseModel):
     credential: str
@@ -52,41 +52,9 @@ async def verify_google_token(token: str) -> Dict[str, Any]:
             detail="Google Client ID is not configured on the server.",
         )
 
-    # First attempt: Verify as ID Token
-    try:
-        id_info = id_token.verify_oauth2_token(
-            token, google_requests.Request(), GOOGLE_CLIENT_ID
-        )
-        return dict(id_info)
-    except Exception:
-        pass
-    
-    # Second attempt: Verify as Access Token
+    # Verify as ID Token against cached certs, falling back to Access Token verification
     try:
-        response = requests.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        if response.status_code == 200:
-             user_info = response.json()
-             # Validate that this token was issued to our client (optional but recommended if possible, 
-             # though userinfo endpoint doesn't always return azp/aud. tokeninfo endpoint does.)
-             # Let's double check via tokeninfo to be safe about audience.
-             token_info_resp = requests.get(f"https://www.googleapis.com/oauth2/v3/tokeninfo?access_token={token}")
-             if token_info_resp.status_code == 200:
-                 token_info = token_info_resp.json()
-                 if token_info.get("aud") != GOOGLE_CLIENT_ID:
-                      print(f"ERROR: Token audience mismatch. Expected {GOOGLE_CLIENT_ID}, got {token_info.get('aud')}")
-                      # raise ValueError("Token audience mismatch") 
-                      # Sometimes audience might be different for access tokens? 
-                      # For access tokens, 'aud' is usually the client_id. 
-                      pass 
-
-             
-             return user_info
-        else:
-            raise ValueError("Invalid Access Token")
-
+        return await google_token_verifier.verify(token)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -119,7 +87,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     if token_data.email is None:
         raise credentials_exception
 
-    user = await user_service.get_user_by_email(email=token_data.email)
+    user = await user_service.get_authenticated_user(email=token_data.email)
     if user is None:
         raise credentials_exception
-    return User(**user.model_dump())
+    return user
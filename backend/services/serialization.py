@@ -0,0 +1,40 @@
+from typing import Any, Iterable, List, Type, TypeVar
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def from_document(model: Type[ModelT], doc: dict) -> ModelT:
+    """Build a response model from a Mongo document without re-validating it.
+
+    Only for documents this service wrote itself: they were validated on the way in,
+    so field types already match and validation would just repeat the work.
+    """
+    doc["_id"] = str(doc["_id"])
+    return model.model_construct(**doc)
+
+
+def from_documents(model: Type[ModelT], docs: Iterable[dict]) -> List[ModelT]:
+    return [from_document(model, doc) for doc in docs]
+
+
+def dump_json(content: Any) -> bytes:
+    """Serialize models (and lists/dicts of them) with pydantic-core's native encoder"""
+    return to_json(content, by_alias=True)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered by pydantic-core.
+
+    Returning it from an endpoint skips FastAPI's response_model re-validation and
+    jsonable_encoder pass, so only use it for content built from trusted models.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
@@ -0,0 +1,157 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from services.llm_accounting import generate_content
+from services.metrics import metrics_registry
+
+if TYPE_CHECKING:
+    from vertexai.generative_models import GenerationConfig
+
+
+T = TypeVar("T", bound=BaseModel)
+
+structured_output_failures = metrics_registry.counter(
+    "llm_structured_output_failures_total",
+    "LLM outputs that failed schema validation, by schema and stage",
+)
+structured_output_repairs = metrics_registry.counter(
+    "llm_structured_output_repairs_total",
+    "Repair attempts for LLM outputs that failed schema validation, by outcome",
+)
+
+# Subset of OpenAPI schema keywords accepted by Vertex AI response schemas
+_SCHEMA_KEYS = {
+    "type",
+    "format",
+    "description",
+    "nullable",
+    "enum",
+    "required",
+    "minItems",
+    "maxItems",
+    "minimum",
+    "maximum",
+}
+
+
+class StructuredOutputError(ValueError):
+    """Raised when the model output cannot be validated against the schema, even after repair."""
+
+    def __init__(self, message: str, raw_text: str = ""):
+        super().__init__(message)
+        self.raw_text = raw_text
+
+
+def _convert_schema(node: dict, defs: dict) -> dict:
+    if "$ref" in node:
+        return _convert_schema(defs[node["$ref"].split("/")[-1]], defs)
+
+    if "anyOf" in node:
+        variants = [v for v in node["anyOf"] if v.get("type") != "null"]
+        nullable = len(variants) < len(node["anyOf"])
+        if len(variants) == 1:
+            converted = _convert_schema(variants[0], defs)
+        else:
+            converted = {"anyOf": [_convert_schema(v, defs) for v in variants]}
+        if nullable:
+            converted["nullable"] = True
+        if "description" in node:
+            converted.setdefault("description", node["description"])
+        return converted
+
+    converted = {}
+    for key, value in node.items():
+        if key == "properties":
+            converted[key] = {name: _convert_schema(prop, defs) for name, prop in value.items()}
+        elif key == "items":
+            converted[key] = _convert_schema(value, defs)
+        elif key in _SCHEMA_KEYS:
+            converted[key] = value
+    return converted
+
+
+@lru_cache(maxsize=None)
+def response_schema(schema: Type[BaseModel]) -> dict:
+    """Convert a Pydantic model into the OpenAPI subset accepted as a Vertex AI response schema."""
+    json_schema = schema.model_json_schema()
+    return _convert_schema(json_schema, json_schema.get("$defs", {}))
+
+
+@lru_cache(maxsize=None)
+def generation_config(schema: Type[BaseModel]) -> "GenerationConfig":
+    """Generation config that constrains the model to JSON matching the schema."""
+    from vertexai.generative_models import GenerationConfig
+
+    return GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=response_schema(schema),
+    )
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` block if the model added one."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def parse_structured(text: str, schema: Type[T]) -> T:
+    """Validate raw model output against the schema, tolerating fences and surrounding prose."""
+    cleaned = strip_code_fences(text)
+    try:
+        return schema.model_validate_json(cleaned)
+    except ValidationError:
+        start, end = cleaned.find("{"), cleaned.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return schema.model_validate_json(cleaned[start : end + 1])
+
+
+def _response_text(response) -> str:
+    try:
+        return response.text
+    except Exception:
+        # Blocked or empty candidates have no text part
+        return ""
+
+
+def generate_structured(model, prompt: str, schema: Type[T], name: str, repair: bool = True) -> T:
+    """
+    Generate schema-constrained JSON and validate it into the Pydantic model.
+    On validation failure a single cheap repair call is made that only sends the
+    broken output and the validation errors back to the model.
+    """
+    config = generation_config(schema)
+    response = generate_content(model, prompt, name, generation_config=config)
+    raw_text = _response_text(response)
+    try:
+        return parse_structured(raw_text, schema)
+    except ValidationError as e:
+        structured_output_failures.inc(schema=name, stage="parse")
+        if not repair:
+            raise StructuredOutputError(f"Invalid {name} output: {e}", raw_text)
+        error = e
+
+    repair_prompt = f"""The following output was supposed to be JSON matching a schema but failed validation.
+Fix it and return ONLY the corrected JSON, preserving the original content as much as possible.
+
+VALIDATION ERRORS:
+{error}
+
+OUTPUT:
+{raw_text}"""
+    response = generate_content(model, repair_prompt, f"{name}_repair", generation_config=config)
+    repaired_text = _response_text(response)
+    try:
+        result = parse_structured(repaired_text, schema)
+    except ValidationError as e:
+        structured_output_failures.inc(schema=name, stage="repair")
+        structured_output_repairs.inc(schema=name, outcome="failed")
+        raise StructuredOutputError(f"Invalid {name} output after repair: {e}", raw_text)
+    structured_output_repairs.inc(schema=name, outcome="repaired")
+    return result
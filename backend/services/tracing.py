@@ -0,0 +1,62 @@
+import functools
+import inspect
+import time
+from typing import Callable, Optional
+
+from services.metrics import metrics_registry
+
+
+stage_duration = metrics_registry.histogram(
+    "stage_duration_seconds", "Duration of instrumented pipeline stages by stage and outcome"
+)
+
+
+def record(stage: str, seconds: float, outcome: str = "ok"):
+    """Record an already measured stage duration"""
+    stage_duration.observe(seconds, stage=stage, outcome=outcome)
+
+
+class span:
+    """Time a block as a pipeline stage: ``with span("rag.load_transcript"): ...``
+
+    Costs two perf_counter calls and one histogram update, so it is safe on hot paths.
+    Works in sync and async code alike; do not hold one open across a generator's yield,
+    or the consumer's time is counted too.
+    """
+
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start: Optional[float] = None
+
+    def __enter__(self) -> "span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        record(self.stage, time.perf_counter() - self._start, "error" if exc_type else "ok")
+        return False
+
+
+def timed(stage: str) -> Callable:
+    """Decorator recording every call of a sync or async function as a stage"""
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
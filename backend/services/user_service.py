@@ -1,8 +1,32 @@
+import os
+from pymongo import IndexModel
 from pymongo.errors import DuplicateKeyError
 from typing import Optional
 from bson import ObjectId
 from models.user import User, UserCreate, UserInDB
 from services.database import mongodb_service
+from services.cache import LRUCache
+
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+
+# Module level because UserService is also instantiated per request via Depends()
+# email (token subject) -> User
+auth_user_cache = LRUCache(
+    "auth_users",
+    max_entries=AUTH_USER_CACHE_SIZE,
+    ttl_seconds=AUTH_USER_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_cached_user(email: Optional[str] = None, user_id: Optional[str] = None):
+    """Drop a resolved user from the auth cache after the user document changed."""
+    if email:
+        auth_user_cache.pop(email)
+    if user_id:
+        for cached_email, user in auth_user_cache.items():
+            if user.id == user_id:
+                auth_user_cache.pop(cached_email)
 
 
 class UserService:
@@ -14,6 +38,20 @@ class UserService:
             return UserInDB(**user_data)
         return None
 
+    async def get_authenticated_user(self, email: str) -> Optional[User]:
+        """Resolve the user for a token subject, served from the in-process auth cache"""
+        user = auth_user_cache.get(email)
+        if user is not None:
+            return user
+
+        collection = mongodb_service.get_collection("users")
+        user_data = await collection.find_one({"email": email})
+        if not user_data:
+            return None
+        user = User(**user_data)
+        auth_user_cache.set(email, user)
+        return user
+
     async def get_or_create_user_from_google(self, google_user_info: dict) -> UserInDB:
         """
         Finds a user by email or creates a new one if they don't exist,
@@ -52,11 +90,9 @@ class UserService:
                     "Could not create or retrieve user after race condition."
                 )
 
-        created_user = await collection.find_one({"_id": result.inserted_id})
-        if created_user:
-            return UserInDB.model_validate(created_user)
-
-        raise ValueError("Could not create user")
+        # Build the user from what was written instead of reading it back
+        user_dict["_id"] = result.inserted_id
+        return UserInDB.model_validate(user_dict)
 
     async def get_user(self, id: str) -> Optional[UserInDB]:
         """Get user by MongoDB _id"""
@@ -79,3 +115,5 @@ class UserService:
 
 # Singleton instance of the user service
 user_service = UserService()
+
+mongodb_service.register_indexes("users", [IndexModel("email", unique=True)])
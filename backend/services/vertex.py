@@ -0,0 +1,37 @@
+import os
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ID = os.getenv("GCP_PROJECT_ID")
+# RAG is in us-west1, but models might be better supported in us-central1
+LOCATION = "us-west1"
+MODEL_LOCATION = "us-central1"
+
+# The Vertex AI SDK is slow to import, so it is loaded and initialised on first use
+_location: Optional[str] = None
+_lock = threading.Lock()
+
+if not PROJECT_ID:
+    print("Warning: GCP_PROJECT_ID not set. Vertex AI functionality will fail.")
+
+
+def init_vertexai(location: str = LOCATION):
+    """Point the Vertex AI SDK at a location, importing and initialising it on first use."""
+    global _location
+    if not PROJECT_ID or _location == location:
+        return
+    with _lock:
+        import vertexai
+
+        vertexai.init(project=PROJECT_ID, location=location)
+        _location = location
+
+
+def ensure_vertexai():
+    """Initialise Vertex AI at the default location unless it already is."""
+    if _location is None:
+        init_vertexai()
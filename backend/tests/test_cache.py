@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import cache as cache_module
+from services.cache import LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_evicts_least_recently_used_over_max_entries():
+    evicted = []
+    cache = LRUCache("test", max_entries=2, on_evict=lambda key, value: evicted.append(key))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert [key for key, _ in cache.items()] == ["a", "c"]
+    assert evicted == ["b"]
+
+
+def test_evicts_until_within_byte_budget():
+    cache = LRUCache("test", max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxxxx")
+
+    assert [key for key, _ in cache.items()] == ["b", "c"]
+    assert cache.total_bytes == 10
+
+
+def test_replacing_a_value_updates_the_byte_total_without_eviction():
+    evicted = []
+    cache = LRUCache("test", max_bytes=10, sizeof=len, on_evict=lambda key, value: evicted.append(key))
+    cache.set("a", "xxxx")
+    cache.set("a", "xxxxxxxx")
+
+    assert cache.get("a") == "xxxxxxxx"
+    assert cache.total_bytes == 8
+    assert evicted == []
+
+
+def test_rejects_a_value_larger_than_the_whole_budget():
+    cache = LRUCache("test", max_bytes=10, sizeof=len)
+    cache.set("small", "xx")
+    cache.set("huge", "x" * 11)
+
+    assert "huge" not in cache
+    assert cache.get("small") == "xx"
+    assert cache.total_bytes == 2
+
+
+def test_oversize_replacement_drops_the_stale_value():
+    cache = LRUCache("test", max_bytes=10, sizeof=len)
+    cache.set("a", "xx")
+    cache.set("a", "x" * 11)
+
+    assert cache.get("a") is None
+    assert cache.total_bytes == 0
+
+
+def test_idle_entries_expire_after_ttl(clock):
+    evicted = []
+    cache = LRUCache("test", ttl_seconds=60, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.set("a", 1)
+    clock[0] += 59
+    # Reading refreshes the idle timer
+    assert cache.get("a") == 1
+    clock[0] += 59
+    assert cache.get("a") == 1
+    clock[0] += 61
+
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+    assert evicted == [("a", 1)]
+
+
+def test_purge_expired_drops_only_idle_entries(clock):
+    cache = LRUCache("test", ttl_seconds=60, sizeof=lambda value: 1)
+    cache.set("old", 1)
+    clock[0] += 30
+    cache.set("fresh", 2)
+    clock[0] += 31
+
+    assert cache.purge_expired() == 1
+    assert [key for key, _ in cache.items()] == ["fresh"]
+    assert cache.total_bytes == 1
+
+
+def test_pop_is_not_an_eviction():
+    evicted = []
+    cache = LRUCache("test", on_evict=lambda key, value: evicted.append(key))
+    cache.set("a", 1)
+
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "gone") == "gone"
+    assert evicted == []
+
+
+def test_a_failing_eviction_callback_does_not_break_the_cache():
+    def on_evict(key, value):
+        raise RuntimeError("boom")
+
+    cache = LRUCache("test", max_entries=1, on_evict=on_evict)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.get("b") == 2
+    assert "a" not in cache
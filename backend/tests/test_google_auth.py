@@ -0,0 +1,168 @@
+"""GoogleTokenVerifier against a local httpx.MockTransport standing in for Google's endpoints."""
+import asyncio
+import datetime
+import time
+from types import SimpleNamespace
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("cryptography")
+google_auth = pytest.importorskip("services.google_auth")
+
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+from google.auth import crypt, jwt as google_jwt  # noqa: E402
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+CERTS_URL = "https://certs.test/certs"
+USERINFO_URL = "https://certs.test/userinfo"
+TOKENINFO_URL = "https://certs.test/tokeninfo"
+
+
+def make_key():
+    """Return (private key PEM, self-signed certificate PEM) for signing test tokens"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {"old": make_key(), "new": make_key()}
+
+
+def sign(keys, kid: str, iss: str = "https://accounts.google.com") -> str:
+    now = int(time.time())
+    payload = {"iss": iss, "aud": CLIENT_ID, "sub": "123", "email": "a@b.test", "iat": now, "exp": now + 600}
+    signer = crypt.RSASigner.from_string(keys[kid][0], key_id=kid)
+    return google_jwt.encode(signer, payload).decode()
+
+
+class GoogleStub:
+    """Serves the given cert sets in turn and records every request"""
+
+    def __init__(self, keys, cert_sets, max_age=100):
+        self.keys = keys
+        self.cert_sets = list(cert_sets)
+        self.max_age = max_age
+        self.requests = []
+
+    def handler(self, request):
+        self.requests.append(request.url.path)
+        kids = self.cert_sets[min(self.certs_fetches, len(self.cert_sets)) - 1]
+        return httpx.Response(
+            200,
+            json={kid: self.keys[kid][1] for kid in kids},
+            headers={"Cache-Control": f"public, max-age={self.max_age}"},
+        )
+
+    @property
+    def certs_fetches(self):
+        return self.requests.count("/certs")
+
+    def verifier(self, handler=None):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler or self.handler))
+        return google_auth.GoogleTokenVerifier(
+            CLIENT_ID, CERTS_URL, USERINFO_URL, TOKENINFO_URL, http_client=client
+        )
+
+
+def test_parse_max_age():
+    assert google_auth.parse_max_age("public, max-age=19845, must-revalidate") == 19845
+    assert google_auth.parse_max_age("no-cache") is None
+    assert google_auth.parse_max_age(None) is None
+
+
+def test_certs_are_cached_for_max_age(keys, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(google_auth, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    stub = GoogleStub(keys, [["old"]], max_age=100)
+    verifier = stub.verifier()
+    token = sign(keys, "old")
+
+    async def run():
+        assert (await verifier.verify_id_token(token))["sub"] == "123"
+        clock[0] += 99
+        await verifier.verify_id_token(token)
+        assert stub.certs_fetches == 1
+        clock[0] += 2
+        await verifier.verify_id_token(token)
+        assert stub.certs_fetches == 2
+
+    asyncio.run(run())
+
+
+def test_unknown_key_id_forces_a_refresh(keys):
+    # Google rotated in a new key while the cached certs were still fresh
+    stub = GoogleStub(keys, [["old"], ["old", "new"]])
+    verifier = stub.verifier()
+
+    async def run():
+        await verifier.get_certs()
+        claims = await verifier.verify_id_token(sign(keys, "new"))
+        assert claims["sub"] == "123"
+        assert stub.certs_fetches == 2
+
+    asyncio.run(run())
+
+
+def test_wrong_issuer_is_rejected(keys):
+    stub = GoogleStub(keys, [["old"]])
+    verifier = stub.verifier()
+
+    with pytest.raises(ValueError, match="Wrong issuer"):
+        asyncio.run(verifier.verify_id_token(sign(keys, "old", iss="https://evil.test")))
+
+
+def test_access_token_falls_back_to_concurrent_userinfo_and_tokeninfo(keys):
+    stub = GoogleStub(keys, [["old"]])
+    both_requested = asyncio.Event()
+    seen = []
+
+    async def handler(request):
+        if request.url.path == "/certs":
+            return stub.handler(request)
+        seen.append(request.url.path)
+        if len(seen) == 2:
+            both_requested.set()
+        # Each lookup waits for the other, so this only completes if they run concurrently
+        await asyncio.wait_for(both_requested.wait(), timeout=2)
+        if request.url.path == "/userinfo":
+            assert request.headers["Authorization"] == "Bearer opaque-access-token"
+            return httpx.Response(200, json={"sub": "456", "email": "c@d.test"})
+        return httpx.Response(200, json={"aud": CLIENT_ID})
+
+    verifier = stub.verifier(handler)
+    userinfo = asyncio.run(verifier.verify("opaque-access-token"))
+
+    assert userinfo == {"sub": "456", "email": "c@d.test"}
+    assert sorted(seen) == ["/tokeninfo", "/userinfo"]
+
+
+def test_rejected_access_token(keys):
+    def handler(request):
+        if request.url.path == "/userinfo":
+            return httpx.Response(401, json={"error": "invalid_token"})
+        return httpx.Response(400, json={"error": "invalid_token"})
+
+    verifier = GoogleStub(keys, []).verifier(handler)
+
+    with pytest.raises(ValueError, match="Invalid Access Token"):
+        asyncio.run(verifier.verify_access_token("expired"))
@@ -0,0 +1,29 @@
+"""Cold start guard: importing main must not load the heavy providers and must stay in budget.
+
+Each check imports main in a fresh interpreter under -X importtime (see
+benchmarks/import_time.py). Skipped when the app's dependencies are not installed.
+"""
+import pytest
+
+from benchmarks import import_time
+
+
+@pytest.fixture(scope="module")
+def main_import_rows():
+    try:
+        return import_time.measure("main")
+    except RuntimeError as e:
+        if "ModuleNotFoundError" in str(e):
+            pytest.skip(f"app dependencies not installed: {str(e).splitlines()[-1]}")
+        raise
+
+
+def test_heavy_providers_load_lazily(main_import_rows):
+    assert import_time.eager_lazy_modules(main_import_rows) == []
+
+
+def test_main_imports_within_budget(main_import_rows):
+    elapsed_ms = import_time.import_ms(main_import_rows, "main")
+    assert elapsed_ms <= import_time.IMPORT_TIME_BUDGET_MS, (
+        f"import main took {elapsed_ms:.0f} ms, budget {import_time.IMPORT_TIME_BUDGET_MS:.0f} ms"
+    )
@@ -0,0 +1,73 @@
+import json
+
+from services.json_stream import JSONArrayStreamParser, iter_json_array_items, parse_json_array
+
+ITEMS = [
+    {"question": "What is 2 + 2?", "options": ["3", "4"], "answer": "4"},
+    {"question": 'Which brace closes "{"?', "options": ["}", "]"], "answer": "}"},
+    {"question": "Escaped \\\" quote and [brackets]", "meta": {"nested": [1, {"deep": True}]}},
+]
+
+
+def chunked(text: str, size: int):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_items_survive_any_chunk_split():
+    text = json.dumps(ITEMS)
+    for size in range(1, len(text) + 1):
+        assert list(iter_json_array_items(chunked(text, size))) == ITEMS, size
+
+
+def test_items_are_yielded_as_soon_as_they_close():
+    parser = JSONArrayStreamParser()
+    first, rest = json.dumps(ITEMS[0]), json.dumps(ITEMS[1])
+
+    assert parser.feed("[" + first[:-1]) == []
+    assert parser.feed("}, " + rest[:5]) == [ITEMS[0]]
+    assert parser.feed(rest[5:] + "]") == [ITEMS[1]]
+    assert parser.done
+
+
+def test_code_fence_prose_and_wrapper_object_are_skipped():
+    text = (
+        "Here are your questions (see [1] and [ref 2]):\n```json\n"
+        + json.dumps({"questions": ITEMS})
+        + "\n```\nGood luck!"
+    )
+    assert parse_json_array(text) == ITEMS
+
+
+def test_whitespace_between_bracket_and_first_object():
+    assert parse_json_array("[\n   " + json.dumps(ITEMS[0]) + "\n]") == [ITEMS[0]]
+
+
+def test_truncated_tail_keeps_completed_items():
+    text = json.dumps(ITEMS)
+    truncated = text[: text.index(json.dumps(ITEMS[2])) + 20]
+    assert parse_json_array(truncated) == ITEMS[:2]
+
+
+def test_malformed_item_only_loses_itself():
+    parser = JSONArrayStreamParser()
+    items = parser.feed('[{"a": 1}, {"b": 2,}, {"c": 3}]')
+
+    assert items == [{"a": 1}, {"c": 3}]
+    assert parser.errors == 1
+
+
+def test_stops_after_the_array_closes():
+    parser = JSONArrayStreamParser()
+    assert parser.feed('[{"a": 1}] and later [{"b": 2}]') == [{"a": 1}]
+    assert parser.done
+    assert parser.feed('{"c": 3}') == []
+
+
+def test_buffer_only_keeps_the_unfinished_item():
+    parser = JSONArrayStreamParser()
+    parser.feed("[")
+    for item in ITEMS * 50:
+        parser.feed(json.dumps(item) + ", ")
+    parser.feed('{"partial": ')
+
+    assert parser._buffer == '{"partial": '
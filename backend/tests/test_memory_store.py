@@ -0,0 +1,40 @@
+import pytest
+
+memory_store = pytest.importorskip("services.memory_store")
+
+
+@pytest.mark.parametrize("a, b", [
+    ("User is a medical student", "User is a music student"),
+    ("User prefers short videos", "User prefers long videos"),
+    ("User prefers Python examples", "User prefers Java examples"),
+])
+def test_different_preferences_are_not_duplicates(a, b):
+    assert not memory_store.is_near_duplicate(a, b)
+    assert memory_store.merge_memories([a], [b]) == [a, b]
+
+
+def test_rewording_replaces_the_older_memory():
+    merged = memory_store.merge_memories(
+        ["User prefers short videos", "User is a medical student"],
+        ["The user prefers very short videos."],
+    )
+    assert merged == ["User is a medical student", "The user prefers very short videos."]
+
+
+def test_blank_memories_are_ignored():
+    assert memory_store.merge_memories(["User prefers short videos"], ["", "  "]) == [
+        "User prefers short videos"
+    ]
+
+
+def test_merge_keeps_memories_over_the_caps_for_compaction(monkeypatch):
+    monkeypatch.setattr(memory_store, "MEMORY_MAX_ITEMS", 2)
+    monkeypatch.setattr(memory_store, "MEMORY_BACKLOG_MAX_ITEMS", 4)
+    memories = [f"User likes topic {i}" for i in range(6)]
+
+    merged = memory_store.merge_memories([], memories)
+
+    # Only the backlog bound drops memories, oldest first
+    assert merged == memories[2:]
+    assert memory_store.over_caps(merged)
+    assert memory_store._most_recent_within_caps(merged) == memories[-2:]
@@ -0,0 +1,36 @@
+"""Query-plan regression tests: every service query must use an index.
+
+Needs a disposable mongod; skipped unless MONGO_URI is set, e.g.
+    MONGO_URI=mongodb://localhost:27017 python -m pytest tests/test_query_plans.py
+"""
+import asyncio
+import os
+
+import pytest
+
+MONGO_URI = os.getenv("MONGO_URI")
+if not MONGO_URI:
+    pytest.skip("MONGO_URI not set", allow_module_level=True)
+
+from benchmarks import check_query_plans as plans  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    # Motor binds the client to one loop, so the whole module shares it
+    loop = asyncio.new_event_loop()
+    db = loop.run_until_complete(plans.prepare(MONGO_URI))
+    try:
+        yield loop, db
+    finally:
+        loop.run_until_complete(plans.cleanup())
+        loop.close()
+
+
+@pytest.mark.parametrize("query", plans.QUERIES, ids=[query[0] for query in plans.QUERIES])
+def test_query_uses_index(plan_db, query):
+    loop, db = plan_db
+    description, *shape = query
+    stages = loop.run_until_complete(plans.plan_stage_names(db, tuple(shape)))
+    bad = plans.BAD_STAGES.intersection(stages)
+    assert not bad, f"{description} plan {' <- '.join(stages)} has {', '.join(sorted(bad))}"
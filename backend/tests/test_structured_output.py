@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+
+structured_output = pytest.importorskip("services.structured_output")
+
+from pydantic import BaseModel, ValidationError  # noqa: E402
+
+from services.structured_output import (  # noqa: E402
+    StructuredOutputError,
+    generate_structured,
+    parse_structured,
+    response_schema,
+)
+
+
+class Note(BaseModel):
+    concept: str
+    timestamp: Optional[str] = None
+
+
+class Notes(BaseModel):
+    notes: List[Note]
+
+
+VALID = '{"notes": [{"concept": "Ohm\'s law", "timestamp": "00:01:00"}]}'
+EXPECTED = Notes(notes=[Note(concept="Ohm's law", timestamp="00:01:00")])
+
+
+class BlockedResponse:
+    @property
+    def text(self):
+        raise ValueError("Response candidate was blocked")
+
+
+BLOCKED = BlockedResponse()
+
+
+class FakeModel:
+    """Returns the queued responses in turn and records the prompts it was sent"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def generate(self, model, prompt, name, generation_config=None):
+        self.calls.append((name, prompt))
+        response = self.responses.pop(0)
+        return response if response is BLOCKED else SimpleNamespace(text=response)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    def install(*responses):
+        model = FakeModel(*responses)
+        monkeypatch.setattr(structured_output, "generate_content", model.generate)
+        monkeypatch.setattr(structured_output, "generation_config", lambda schema: None)
+        return model
+
+    return install
+
+
+@pytest.mark.parametrize("text", [
+    VALID,
+    f"```json\n{VALID}\n```",
+    f"```\n{VALID}```",
+    f"Sure! Here are the notes:\n{VALID}\nLet me know if you need more.",
+])
+def test_parse_tolerates_fences_and_prose(text):
+    assert parse_structured(text, Notes) == EXPECTED
+
+
+@pytest.mark.parametrize("text", ['{"notes": [{"timestamp": "x"}]}', '{"notes": [', "no json here"])
+def test_parse_rejects_invalid_output(text):
+    with pytest.raises(ValidationError):
+        parse_structured(text, Notes)
+
+
+def test_response_schema_inlines_refs_and_marks_optional_fields_nullable():
+    schema = response_schema(Notes)
+    note = schema["properties"]["notes"]["items"]
+
+    assert note["properties"]["timestamp"] == {"type": "string", "nullable": True}
+    assert note["required"] == ["concept"]
+    assert "$defs" not in schema and "title" not in schema
+
+
+def test_valid_output_needs_no_repair(fake_model):
+    model = fake_model(VALID)
+
+    assert generate_structured(None, "prompt", Notes, "notes") == EXPECTED
+    assert [name for name, _ in model.calls] == ["notes"]
+
+
+def test_invalid_output_is_repaired_with_one_call(fake_model):
+    broken = '{"notes": [{"timestamp": "00:01:00"}]}'
+    model = fake_model(broken, VALID)
+
+    assert generate_structured(None, "Explain the transcript", Notes, "notes") == EXPECTED
+    assert [name for name, _ in model.calls] == ["notes", "notes_repair"]
+    # The repair call only carries the broken output and the errors, not the original prompt
+    repair_prompt = model.calls[1][1]
+    assert broken in repair_prompt and "concept" in repair_prompt
+    assert "Explain the transcript" not in repair_prompt
+
+
+def test_failed_repair_raises_with_the_original_output(fake_model):
+    model = fake_model("not json", "still not json")
+
+    with pytest.raises(StructuredOutputError) as raised:
+        generate_structured(None, "prompt", Notes, "notes")
+    assert raised.value.raw_text == "not json"
+    assert len(model.calls) == 2
+
+
+def test_blocked_response_is_repaired_like_invalid_output(fake_model):
+    model = fake_model(BLOCKED, VALID)
+
+    assert generate_structured(None, "prompt", Notes, "notes") == EXPECTED
+    assert len(model.calls) == 2
+
+
+def test_repair_can_be_disabled(fake_model):
+    model = fake_model("not json")
+
+    with pytest.raises(StructuredOutputError):
+        generate_structured(None, "prompt", Notes, "notes", repair=False)
+    assert len(model.calls) == 1
@@ -1,5 +1,5 @@
 import React, { useState } from 'react'
-import { getUserConversations } from '../../services/apiService'
+import { getUserConversationSummaries } from '../../services/apiService'
 import { Conversation } from './types'
 
 interface ConversationSelectorProps {
@@ -22,13 +22,16 @@ const ConversationSelector: React.FC<ConversationSelectorProps> = ({
     const [error, setError] = useState<string | null>(null)
     const [isOpen, setIsOpen] = useState(false)
     const [conversationsLoaded, setConversationsLoaded] = useState(false)
+    const [nextCursor, setNextCursor] = useState<string | null>(null)
 
-    const loadConversations = async () => {
+    const loadConversations = async (cursor: string | null = null) => {
         try {
             setIsLoading(true)
             setError(null)
-            const userConversations = await getUserConversations(userId)
-            setConversations(userConversations || [])
+            const page = await getUserConversationSummaries(userId, cursor)
+            const summaries = page?.conversations || []
+            setConversations(prev => (cursor ? [...prev, ...summaries] : summaries))
+            setNextCursor(page?.next_cursor ?? null)
         } catch (err) {
             setError(err.message)
             console.error('Failed to load conversations:', err)
@@ -147,6 +150,16 @@ const ConversationSelector: React.FC<ConversationSelectorProps> = ({
                                     </button>
                                 ))}
 
+                            {nextCursor && (
+                                <button
+                                    onClick={() => loadConversations(nextCursor)}
+                                    disabled={isLoading}
+                                    className="w-full text-center px-3 py-2 text-xs text-[#cdcdcd] rounded hover:bg-white/10 transition-colors"
+                                >
+                                    {isLoading ? 'Loading...' : 'Load older conversations'}
+                                </button>
+                            )}
+
                             {conversations.filter(conv => conv.id !== currentVideoConversation?.id).length === 0 && (
                                 <div className="text-[#cdcdcd] text-xs px-3 py-2 text-center">
                                     No previous conversations
@@ -41,10 +41,10 @@ const QuizDisplay = ({ questions, onWrongAnswer, onCreateRevision }) => {
         setIsSubmitting(true);
         setFeedbackStatus(null);
         try {
-            const result = await submitFeedback(userId, feedbackText);
+            await submitFeedback(userId, feedbackText);
             setFeedbackStatus({
                 type: 'success',
-                message: result.stored ? 'Preference saved!' : 'Feedback received.'
+                message: 'Feedback queued. Thanks!'
             });
             setFeedbackText('');
             // Auto-close after 2 seconds
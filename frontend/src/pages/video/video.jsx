@@ -229,10 +229,10 @@ const Video = () => {
     setIsSubmittingFeedback(true);
     setFeedbackStatus(null);
     try {
-      const result = await submitFeedback(userId, feedbackText);
+      await submitFeedback(userId, feedbackText);
       setFeedbackStatus({
         type: 'success',
-        message: result.stored ? 'Preference saved!' : 'Feedback received.'
+        message: 'Feedback queued. Thanks!'
       });
       setFeedbackText('');
       setTimeout(() => {
@@ -1,6 +1,6 @@
 import { useExternalStoreRuntime } from '@assistant-ui/react'
 import { useState, useCallback } from 'react'
-import { getConversationMessages, sendUserQuery } from '../services/apiService'
+import { getConversationMessageHistory, sendUserQuery } from '../services/apiService'
 import { Conversation, MessageResponse } from '../components/Chatbox/types'
 
 const API_BASE_URL = 'http://localhost:8000'
@@ -12,6 +12,7 @@ interface ConversationState {
     error: string | null
     currentPage: number
     hasNextPage: boolean
+    nextCursor: string | null
     isAiResponding: boolean
     lastError: any
     retryCount: number
@@ -26,6 +27,7 @@ let conversationState: ConversationState = {
     error: null,
     currentPage: 1,
     hasNextPage: false,
+    nextCursor: null,
     isAiResponding: false,
     lastError: null,
     retryCount: 0,
@@ -104,10 +106,11 @@ export const loadConversationMessages = async (conversationId: string, page = 1,
         conversationState.isLoading = true
         conversationState.error = null
 
-        const response = await getConversationMessages(conversationId, page)
+        // Page 1 is the newest messages; later pages continue from the previous page's cursor
+        const cursor = page === 1 ? null : conversationState.nextCursor
+        const response = await getConversationMessageHistory(conversationId, cursor)
 
-        // The API returns messages array directly, not response.messages
-        const messages = Array.isArray(response) ? response : []
+        const messages = Array.isArray(response?.messages) ? response.messages : []
         const convertedMessages = messages
             .filter(msg => msg && (msg._id || msg.id)) // Filter out null/undefined messages
             .map(msg => convertBackendMessageToAssistantUI(msg))
@@ -120,7 +123,8 @@ export const loadConversationMessages = async (conversationId: string, page = 1,
         }
 
         conversationState.currentPage = page
-        conversationState.hasNextPage = messages.length === 50 // If we got a full page, there might be more
+        conversationState.nextCursor = response?.next_cursor ?? null
+        conversationState.hasNextPage = conversationState.nextCursor !== null
 
         // Update React state via callback if provided
         if (setMessagesCallback) {
@@ -148,6 +152,7 @@ export const setCurrentConversation = async (conversation: Conversation | null,
     conversationState.messages = []
     conversationState.currentPage = 1
     conversationState.hasNextPage = false
+    conversationState.nextCursor = null
 
     if (conversation) {
         await loadConversationMessages(conversation.id, 1, setMessagesCallback)
@@ -239,6 +239,28 @@ export const getUserConversations = async (userId) => {
   }
 }
 
+export const getUserConversationSummaries = async (userId, cursor = null, limit = 50) => {
+  try {
+    const params = new URLSearchParams({ limit: String(limit) })
+    if (cursor) params.set('cursor', cursor)
+    const data = await apiRequest(`${PYTHON_API_BASE_URL}/api/conversations/${userId}/summaries?${params}`)
+    return data
+  } catch (error) {
+    console.error('Get User Conversation Summaries Error:', error)
+    throw error
+  }
+}
+
+export const getConversation = async (conversationId) => {
+  try {
+    const data = await apiRequest(`${PYTHON_API_BASE_URL}/api/conversation/${conversationId}`)
+    return data
+  } catch (error) {
+    console.error('Get Conversation Error:', error)
+    throw error
+  }
+}
+
 export const getConversationMessages = async (conversationId, page = 1, limit = 50) => {
   try {
     const data = await apiRequest(`${PYTHON_API_BASE_URL}/api/messages/${conversationId}?page=${page}&limit=${limit}`)
@@ -249,6 +271,18 @@ export const getConversationMessages = async (conversationId, page = 1, limit =
   }
 }
 
+export const getConversationMessageHistory = async (conversationId, cursor = null, limit = 50) => {
+  try {
+    const params = new URLSearchParams({ limit: String(limit) })
+    if (cursor) params.set('cursor', cursor)
+    const data = await apiRequest(`${PYTHON_API_BASE_URL}/api/messages/${conversationId}/history?${params}`)
+    return data
+  } catch (error) {
+    console.error('Get Conversation Message History Error:', error)
+    throw error
+  }
+}
+
 export const createConversation = async (conversationData) => {
   try {
     const data = await apiRequest(`${PYTHON_API_BASE_URL}/api/conversations`, {